@@ -0,0 +1,51 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+
+def appearance_hash(character: Optional[dict]) -> Optional[str]:
+    """Short content hash of an appearance; equal appearances share one hash"""
+    if character is None:
+        return None
+    canonical = json.dumps(character, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class AppearanceRegistry:
+    """hash -> appearance for every player this process has seen, served by GET /api/character/appearance/{hash}
+
+    Least recently used entries are evicted first; registering, sending or serving a
+    hash marks it as used, so appearances of connected players stay fetchable.
+    """
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    def register(self, character: Optional[dict]) -> Optional[str]:
+        appearance = appearance_hash(character)
+        if appearance is not None:
+            self.keep(appearance, character)
+        return appearance
+
+    def keep(self, appearance: str, character: dict):
+        """Mark an appearance as in use, adding it back if it was evicted"""
+        entries = self.entries
+        if appearance in entries:
+            entries.move_to_end(appearance)
+            return
+        entries[appearance] = character
+        while len(entries) > settings.APPEARANCE_REGISTRY_SIZE:
+            entries.popitem(last=False)
+
+    def get(self, appearance: str) -> Optional[dict]:
+        character = self.entries.get(appearance)
+        if character is not None:
+            self.entries.move_to_end(appearance)
+        return character
+
+
+# Global appearance registry
+appearances = AppearanceRegistry()
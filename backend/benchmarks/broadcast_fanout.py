@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Broadcast fan-out microbenchmark for ConnectionManager.
+Puts N fake clients in one room and broadcasts position updates to them,
+comparing the old per-recipient send_json (one JSON encode per client)
+with ConnectionManager.broadcast_to_room (one encode per broadcast, the
+same frame queued for every client). Reports CPU time per broadcast, and
+the cost of a maze-wide broadcast while other mazes have many occupied rooms.
+
+Usage (from backend/):
+    python -m benchmarks.broadcast_fanout                      # 50 clients
+    python -m benchmarks.broadcast_fanout --clients 200 --broadcasts 5000
+    python -m benchmarks.broadcast_fanout --other-rooms 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+_db_dir = tempfile.mkdtemp(prefix="maze-fanout-bench-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+import database  # noqa: E402
+database.engine.echo = False
+
+from send_queue import orjson  # noqa: E402
+from websocket_handler import ConnectionManager  # noqa: E402
+
+
+class FakeWebSocket:
+    """Client that accepts frames instantly; send_json encodes like Starlette does"""
+
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data: str):
+        self.frames += 1
+
+    async def send_json(self, data: dict):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+def position_update(i: int) -> dict:
+    return {
+        "type": "player_moved",
+        "user_id": 1,
+        "pos_x": 1.2345 + i * 0.001,
+        "pos_y": 1.6,
+        "pos_z": -3.4567,
+        "yaw": 0.785398,
+        "pitch": -0.1
+    }
+
+
+async def per_recipient(sockets: list, broadcasts: int) -> float:
+    """Previous behaviour: await send_json for every recipient"""
+    started = time.process_time()
+    for i in range(broadcasts):
+        message = position_update(i)
+        for ws in sockets:
+            try:
+                await ws.send_json(message)
+            except Exception:
+                pass
+    return time.process_time() - started
+
+
+async def encode_once(manager: ConnectionManager, room_key: Tuple[int, int, int], broadcasts: int) -> float:
+    """Current behaviour: encode once, queue the frame, writers send it"""
+    started = time.process_time()
+    for i in range(broadcasts):
+        await manager.broadcast_to_room(room_key, position_update(i), droppable=True)
+        await asyncio.sleep(0)  # let the writer tasks drain, as the event loop would
+    await drain(manager)
+    return time.process_time() - started
+
+
+async def drain(manager: ConnectionManager):
+    while any(len(conn.queue) for conn in manager.connections.values()):
+        await asyncio.sleep(0)
+
+
+async def maze_wide(manager: ConnectionManager, broadcasts: int) -> float:
+    """broadcast_to_maze to maze 1 (big-reward announcements)"""
+    message = {"type": "reward_claimed", "reward_type": "big", "amount": 100.0, "winner": "player0"}
+    cpu = 0.0
+    for i in range(broadcasts):
+        started = time.process_time()
+        await manager.broadcast_to_maze(1, message)
+        cpu += time.process_time() - started
+        await drain(manager)  # not timed
+    return cpu
+
+
+async def main(clients: int, broadcasts: int, other_rooms: int) -> int:
+    manager = ConnectionManager()
+    sockets = [FakeWebSocket() for _ in range(clients)]
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, i + 1, f"player{i}", i + 1, 1, 0, 0)
+    room_key = manager._room_key(1, 0, 0)
+
+    print("=" * 60)
+    print(f"Broadcast fan-out - {clients} clients x {broadcasts} broadcasts "
+          f"(encoder: {'orjson' if orjson else 'json'})")
+    print("=" * 60)
+
+    before = await per_recipient(sockets, broadcasts)
+    after = await encode_once(manager, room_key, broadcasts)
+
+    for label, cpu in (("per-recipient send_json", before), ("encode once + queues", after)):
+        print(f"{label:>24}: {cpu * 1000:8.1f}ms CPU  {cpu / broadcasts * 1e6:8.1f}µs/broadcast")
+    print("-" * 60)
+    print(f"Encodes per broadcast: {clients} -> 1;  CPU reduction: {(1 - after / before) * 100:.0f}%")
+
+    # One idle player in each of other_rooms rooms of another maze
+    others = [FakeWebSocket() for _ in range(other_rooms)]
+    for i, ws in enumerate(others):
+        await manager.connect(ws, clients + i + 1, f"other{i}", clients + i + 1, 2, i, 0)
+
+    maze_broadcasts = max(1, broadcasts // 10)
+    cpu = await maze_wide(manager, maze_broadcasts)
+    print(f"Maze-wide broadcast to {clients} clients ({other_rooms} rooms occupied elsewhere): "
+          f"{cpu / maze_broadcasts * 1e6:.1f}µs/broadcast")
+
+    for ws in sockets + others:
+        await manager.disconnect(ws)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--broadcasts", type=int, default=2000)
+    parser.add_argument("--other-rooms", type=int, default=1000, help="occupied rooms in another maze")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.clients, args.broadcasts, args.other_rooms)))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Reward claim contention benchmark.
+Spawns one reward and lets N players claim it at the same moment, each on
+its own session, then verifies there was exactly one winner and that the
+money moved exactly once.
+
+On SQLite every claimer's UPDATE takes the database write lock, so
+claimers serialize and some give up with "database is locked" after the
+driver's busy timeout; they are reported as busy, not as failures.
+
+Usage (from backend/):
+    python -m benchmarks.claim_contention                 # 300 claimers
+    python -m benchmarks.claim_contention --claimers 1000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_db_dir = tempfile.mkdtemp(prefix="maze-claim-bench-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+from datetime import datetime, timedelta  # noqa: E402
+from sqlalchemy import select, func, insert  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import database  # noqa: E402
+database.engine.echo = False
+
+from database import init_db, async_session  # noqa: E402
+from models.maze import Maze  # noqa: E402
+from models.reward import Reward, RewardClaim, RewardType  # noqa: E402
+from models.transaction import Transaction  # noqa: E402
+from models.user import User  # noqa: E402
+from services.reward import RewardService  # noqa: E402
+
+
+async def setup(claimers: int) -> int:
+    await init_db()
+    async with async_session() as db:
+        maze = Maze(name="bench", width=1, height=1)
+        db.add(maze)
+        await db.flush()
+        await db.execute(insert(User), [
+            {
+                "username": f"claimer{i}",
+                "email": f"claimer{i}@example.com",
+                "hashed_password": "x",
+                "balance": 0.0
+            }
+            for i in range(claimers)
+        ])
+        await db.commit()
+        return maze.id
+
+
+async def claim(reward_id: int, user_id: int, start: asyncio.Event, latencies: list) -> bool:
+    async with async_session() as db:
+        user = await db.get(User, user_id)
+        reward = await db.get(Reward, reward_id)
+        await start.wait()
+
+        started = time.perf_counter()
+        result = await RewardService(db).claim_reward(reward, user)
+        latencies.append(time.perf_counter() - started)
+        return result["success"]
+
+
+async def run_round(maze_id: int, user_ids: list) -> dict:
+    async with async_session() as db:
+        reward = Reward(
+            maze_id=maze_id,
+            room_x=0,
+            room_y=0,
+            reward_type=RewardType.SMALL.value,
+            amount=10.0,
+            expires_at=datetime.utcnow() + timedelta(minutes=5)
+        )
+        db.add(reward)
+        await db.commit()
+        reward_id = reward.id
+
+    start = asyncio.Event()
+    latencies: list = []
+    tasks = [asyncio.create_task(claim(reward_id, uid, start, latencies)) for uid in user_ids]
+    await asyncio.sleep(0.1)  # let every claimer load its rows first
+
+    started = time.perf_counter()
+    start.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    async with async_session() as db:
+        claims = await db.scalar(select(func.count(RewardClaim.id)).where(RewardClaim.reward_id == reward_id))
+        transactions = await db.scalar(
+            select(func.count(Transaction.id)).where(Transaction.reference_id == reward_id)
+        )
+
+    latencies.sort()
+    return {
+        "winners": sum(1 for r in results if r is True),
+        "busy": sum(1 for r in results if isinstance(r, OperationalError) and "locked" in str(r)),
+        "errors": sum(
+            1 for r in results
+            if isinstance(r, Exception) and not (isinstance(r, OperationalError) and "locked" in str(r))
+        ),
+        "claims": claims,
+        "transactions": transactions,
+        "elapsed": elapsed,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0,
+    }
+
+
+async def main(claimers: int, rounds: int) -> int:
+    maze_id = await setup(claimers)
+    async with async_session() as db:
+        user_ids = (await db.execute(select(User.id))).scalars().all()
+
+    print("=" * 60)
+    print(f"Reward claim contention - {claimers} claimers x {rounds} rounds")
+    print("=" * 60)
+
+    ok = True
+    for i in range(rounds):
+        r = await run_round(maze_id, user_ids)
+        round_ok = r["winners"] == 1 and r["claims"] == 1 and r["transactions"] == 1 and not r["errors"]
+        ok = ok and round_ok
+        print(
+            f"{'✓' if round_ok else '✗'} round {i + 1}: winners={r['winners']} claims={r['claims']} "
+            f"transactions={r['transactions']} busy={r['busy']} errors={r['errors']} "
+            f"total={r['elapsed'] * 1000:.0f}ms p50={r['p50'] * 1000:.1f}ms p99={r['p99'] * 1000:.1f}ms"
+        )
+
+    async with async_session() as db:
+        paid = await db.scalar(select(func.sum(User.balance)))
+    print("-" * 60)
+    print(f"Total paid out: ${paid:.2f} (expected ${10.0 * rounds:.2f})")
+    return 0 if ok and abs(paid - 10.0 * rounds) < 1e-6 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claimers", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.claimers, args.rounds)))
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Offline economy simulator for reward and trap tuning.
+Runs simulated players as vectorized random walks over a maze's door grid
+and applies the spawn, claim and trap rules of RewardService/TrapService,
+so spawn chances and trap density can be tuned without a live maze.
+
+Players are split into independent copies of the maze (--players-per-maze
+each); every step each unfrozen player walks through a random open door.
+Rewards spawn as the scheduler does (Poisson, REWARD_SPAWN_INTERVAL) in
+rooms without players, are claimed by the first player to enter before
+they expire, and traps are kept at --trap-density of the rooms.
+
+Reports payout rate, claim rate and latency, trap hits, and the revenue
+needed for the house to keep COMPANY_REVENUE_SHARE.
+
+Usage (from backend/, after pip install -r requirements-dev.txt):
+    python -m benchmarks.economy_sim --maze-id 1        # layout from DATABASE_URL
+    python -m benchmarks.economy_sim --size 20x20 --players 2000 --steps 500
+    python -m benchmarks.economy_sim --big-chance 0.01 --trap-density 0.05 \\
+        --revenue-per-player-hour 2.5
+"""
+
+import argparse
+import asyncio
+import math
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+import database
+database.engine.echo = False
+
+from config import settings  # noqa: E402
+from database import async_session  # noqa: E402
+from models.maze import Maze, Room  # noqa: E402
+from models.trap import TrapType  # noqa: E402
+from services.maze import MazeService  # noqa: E402
+from services.trap import TRAP_DURATIONS, LOSE_REWARD_PENALTY  # noqa: E402
+
+
+DIRECTIONS = (("north", 0, 1), ("south", 0, -1), ("east", 1, 0), ("west", -1, 0))
+TRAP_TYPES = [t.value for t in TrapType]
+
+
+class MazeLayout:
+    """Door grid of a maze as arrays; room index = y * width + x"""
+
+    def __init__(self, width: int, height: int, rooms, big_chance: float, small_chance: float):
+        self.width = width
+        self.height = height
+        self.big_chance = big_chance
+        self.small_chance = small_chance
+        self.room_count = width * height
+
+        # Open doors packed to the front of each row; unused slots point back at the room
+        self.neighbors = np.repeat(np.arange(self.room_count)[:, None], 4, axis=1)
+        self.degree = np.zeros(self.room_count, dtype=np.int64)
+        sold = np.zeros(self.room_count, dtype=bool)
+
+        for room in rooms:
+            index = self.index(room.x, room.y)
+            sold[index] = bool(room.is_sold)
+            for direction, dx, dy in DIRECTIONS:
+                nx, ny = room.x + dx, room.y + dy
+                if getattr(room, f"door_{direction}") and 0 <= nx < width and 0 <= ny < height:
+                    self.neighbors[index, self.degree[index]] = self.index(nx, ny)
+                    self.degree[index] += 1
+
+        # spawn_small_reward prefers sold (ad) rooms, falling back to any room
+        self.small_reward_rooms = sold if sold.any() else np.ones(self.room_count, dtype=bool)
+
+    def index(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+
+async def load_layout(maze_id: int) -> MazeLayout:
+    async with async_session() as db:
+        maze = await db.get(Maze, maze_id)
+        if maze is None:
+            raise SystemExit(f"Maze {maze_id} not found")
+        result = await db.execute(select(Room).where(Room.maze_id == maze_id))
+        rooms = result.scalars().all()
+        return MazeLayout(maze.width, maze.height, rooms, maze.big_reward_chance, maze.small_reward_chance)
+
+
+def generate_layout(width: int, height: int) -> MazeLayout:
+    """Fresh layout from the game's own door generator, without a database"""
+    rooms = [
+        Room(x=x, y=y, door_north=False, door_south=False, door_east=False, door_west=False, is_sold=False)
+        for y in range(height)
+        for x in range(width)
+    ]
+    asyncio.run(MazeService(None)._generate_doors(rooms, width, height))
+    return MazeLayout(width, height, rooms, settings.BIG_REWARD_SPAWN_CHANCE, settings.SMALL_REWARD_SPAWN_CHANCE)
+
+
+def spawn_probability(chance: float, step_seconds: float) -> float:
+    """Chance of at least one scheduler spawn within one step (see RewardScheduler._schedule_spawn)"""
+    if chance <= 0:
+        return 0.0
+    if chance >= 1:
+        return min(1.0, step_seconds / settings.REWARD_SPAWN_INTERVAL)
+    return 1 - (1 - chance) ** (step_seconds / settings.REWARD_SPAWN_INTERVAL)
+
+
+def pick_rooms(rng, eligible: np.ndarray, counts: np.ndarray):
+    """Choose up to counts[i] distinct eligible rooms in each row; returns (row, room) arrays"""
+    keys = np.where(eligible, rng.random(eligible.shape), -1.0)
+    k = int(counts.max())
+    if k == 1:
+        order = keys.argmax(axis=1)[:, None]
+    else:
+        order = np.argsort(-keys, axis=1)[:, :k]
+    rows = np.arange(len(keys))[:, None]
+    take = (np.arange(order.shape[1])[None, :] < counts[:, None]) & (keys[rows, order] >= 0)
+    return np.broadcast_to(rows, order.shape)[take], order[take]
+
+
+def simulate(
+    layout: MazeLayout,
+    players: int,
+    players_per_maze: int,
+    steps: int,
+    step_seconds: float,
+    trap_density: float,
+    trap_lifetime: float,
+    seed: int = None
+) -> dict:
+    rng = np.random.default_rng(seed)
+    R = layout.room_count
+    M = max(1, math.ceil(players / players_per_maze))
+    P = players_per_maze
+    start = layout.index(0, 0)
+
+    pos = np.full((M, P), start, dtype=np.int64)
+    frozen_until = np.zeros((M, P))
+    balance = np.zeros(M * P)
+    maze_offset = (np.arange(M) * R)[:, None]
+
+    # At most one live reward / trap per room (get_*_in_room return a single row)
+    reward_amount = np.zeros(M * R)
+    reward_expires = np.full(M * R, -np.inf)
+    reward_spawned = np.zeros(M * R)
+    reward_big = np.zeros(M * R, dtype=bool)
+    trap_type = np.full(M * R, -1, dtype=np.int64)
+    trap_expires = np.full(M * R, np.inf)
+
+    # spawn_trap never uses the starting room
+    trap_rooms = np.ones(R, dtype=bool)
+    trap_rooms[start] = False
+    trap_target = int(round(trap_density * trap_rooms.sum()))
+
+    reward_kinds = (
+        ("big", spawn_probability(layout.big_chance, step_seconds), np.ones(R, dtype=bool),
+         settings.BIG_REWARD_MIN_AMOUNT, settings.BIG_REWARD_MAX_AMOUNT, settings.BIG_REWARD_DURATION),
+        ("small", spawn_probability(layout.small_chance, step_seconds), layout.small_reward_rooms,
+         settings.SMALL_REWARD_MIN_AMOUNT, settings.SMALL_REWARD_MAX_AMOUNT, settings.SMALL_REWARD_DURATION),
+    )
+    stats = {
+        "mazes": M,
+        "players": M * P,
+        "spawned": {"big": 0, "small": 0},
+        "no_room": {"big": 0, "small": 0},
+        "claimed": {"big": 0, "small": 0},
+        "paid": {"big": 0.0, "small": 0.0},
+        "penalties": 0.0,
+        "trap_triggers": np.zeros(len(TRAP_TYPES), dtype=np.int64),
+        "traps_expired": 0,
+        "frozen_player_steps": 0,
+    }
+    latencies = []
+
+    for step in range(steps):
+        t = step * step_seconds
+
+        # Traps: expire, then top up to the target density
+        if trap_target:
+            expired = (trap_type >= 0) & (trap_expires <= t)
+            stats["traps_expired"] += int(expired.sum())
+            trap_type[expired] = -1
+
+            live = (trap_type >= 0).reshape(M, R)
+            deficit = trap_target - live.sum(axis=1)
+            short = np.flatnonzero(deficit > 0)
+            if short.size:
+                rows, rooms = pick_rooms(rng, ~live[short] & trap_rooms, deficit[short])
+                flat = short[rows] * R + rooms
+                trap_type[flat] = rng.integers(len(TRAP_TYPES), size=flat.size)
+                trap_expires[flat] = t + trap_lifetime if trap_lifetime > 0 else np.inf
+
+        # Rewards: spawn only in rooms without players (or a live reward)
+        occupied = np.bincount((pos + maze_offset).ravel(), minlength=M * R).reshape(M, R) > 0
+        free = ~occupied & (reward_expires <= t).reshape(M, R)
+        for kind, probability, candidates, low, high, duration in reward_kinds:
+            spawning = np.flatnonzero(rng.random(M) < probability)
+            if not spawning.size:
+                continue
+            rows, rooms = pick_rooms(rng, free[spawning] & candidates, np.ones(spawning.size, dtype=np.int64))
+            stats["spawned"][kind] += rows.size
+            stats["no_room"][kind] += spawning.size - rows.size
+
+            # Spawns land anywhere within the step, players arrive at its end
+            flat = spawning[rows] * R + rooms
+            spawned_at = t + rng.random(flat.size) * step_seconds
+            reward_amount[flat] = np.round(rng.uniform(low, high, flat.size), 2)
+            reward_expires[flat] = spawned_at + duration
+            reward_spawned[flat] = spawned_at
+            reward_big[flat] = kind == "big"
+            free[spawning[rows], rooms] = False
+
+        # Move every unfrozen player through a random open door
+        mobile = (frozen_until <= t).ravel()
+        stats["frozen_player_steps"] += int(mobile.size - mobile.sum())
+        movers = np.flatnonzero(mobile)
+        flat_pos = pos.reshape(-1)
+        current = flat_pos[movers]
+        choice = (rng.random(movers.size) * np.maximum(layout.degree[current], 1)).astype(np.int64)
+        flat_pos[movers] = layout.neighbors[current, choice]
+        arrived = flat_pos[movers] + movers // P * R
+        t += step_seconds
+
+        # First player into a room with a live reward claims it (random among simultaneous arrivals)
+        hit = np.flatnonzero(reward_expires[arrived] > t)
+        if hit.size:
+            hit = rng.permutation(hit)
+            rooms, first = np.unique(arrived[hit], return_index=True)
+            winners = movers[hit[first]]
+            amounts = reward_amount[rooms]
+            balance[winners] += amounts
+            big = reward_big[rooms]
+            stats["claimed"]["big"] += int(big.sum())
+            stats["claimed"]["small"] += int((~big).sum())
+            stats["paid"]["big"] += float(amounts[big].sum())
+            stats["paid"]["small"] += float(amounts[~big].sum())
+            latencies.append(t - reward_spawned[rooms])
+            reward_expires[rooms] = -np.inf
+
+        # Then the room's trap, if any (same order as POST /api/maze/move)
+        hit = np.flatnonzero(trap_type[arrived] >= 0)
+        if hit.size:
+            hit = rng.permutation(hit)
+            rooms, first = np.unique(arrived[hit], return_index=True)
+            victims = movers[hit[first]]
+            types = trap_type[rooms]
+            trap_type[rooms] = -1
+            stats["trap_triggers"] += np.bincount(types, minlength=len(TRAP_TYPES))
+
+            for type_index, trap in enumerate(TRAP_TYPES):
+                affected = victims[types == type_index]
+                if not affected.size:
+                    continue
+                if trap == TrapType.TELEPORT_START.value:
+                    flat_pos[affected] = start
+                elif trap == TrapType.RANDOM_TELEPORT.value:
+                    flat_pos[affected] = rng.integers(R, size=affected.size)
+                elif trap == TrapType.FREEZE.value:
+                    frozen_until.reshape(-1)[affected] = t + TRAP_DURATIONS[trap]
+                elif trap == TrapType.LOSE_REWARD.value:
+                    penalty = balance[affected] * LOSE_REWARD_PENALTY
+                    balance[affected] -= penalty
+                    stats["penalties"] += float(penalty.sum())
+                # blind / slow / reverse_controls are client-side only
+
+    stats["latencies"] = np.concatenate(latencies) if latencies else np.zeros(0)
+    stats["balances"] = balance
+    return stats
+
+
+def report(stats: dict, steps: int, step_seconds: float, elapsed: float, revenue_per_player_hour: float):
+    player_steps = stats["players"] * steps
+    player_hours = player_steps * step_seconds / 3600
+    maze_hours = stats["mazes"] * steps * step_seconds / 3600
+    paid = stats["paid"]["big"] + stats["paid"]["small"]
+    net_paid = paid - stats["penalties"]
+
+    print("-" * 60)
+    print(f"Simulated {player_steps:,} player-steps ({player_hours:,.1f} player-hours) in {elapsed:.2f}s "
+          f"({player_steps / max(elapsed, 1e-9):,.0f} steps/s)")
+
+    print("-" * 60)
+    for kind in ("big", "small"):
+        spawned, claimed = stats["spawned"][kind], stats["claimed"][kind]
+        rate = claimed / spawned * 100 if spawned else 0.0
+        print(f"{kind:>5} rewards: spawned={spawned} claimed={claimed} ({rate:.1f}%) "
+              f"no_free_room={stats['no_room'][kind]} paid=${stats['paid'][kind]:,.2f}")
+
+    latencies = stats["latencies"]
+    if latencies.size:
+        p50, p90 = np.percentile(latencies, [50, 90])
+        print(f"Claim latency: mean={latencies.mean():.1f}s p50={p50:.1f}s p90={p90:.1f}s")
+
+    triggers = stats["trap_triggers"]
+    if triggers.sum() or stats["traps_expired"]:
+        hits = " ".join(f"{trap}={count}" for trap, count in zip(TRAP_TYPES, triggers) if count)
+        print(f"Traps: triggered={int(triggers.sum())} ({hits or '-'}) expired={stats['traps_expired']}")
+        print(f"Time frozen: {stats['frozen_player_steps'] / player_steps * 100:.1f}% of player-steps; "
+              f"penalties recovered ${stats['penalties']:,.2f}")
+
+    print("-" * 60)
+    share = settings.COMPANY_REVENUE_SHARE
+    payout_rate = net_paid / player_hours if player_hours else 0.0
+    print(f"Net payout: ${net_paid:,.2f}  (${payout_rate:,.4f}/player-hour, "
+          f"${net_paid / maze_hours if maze_hours else 0.0:,.2f}/maze-hour)")
+    balances = stats["balances"]
+    print(f"Players paid: {(balances > 0).mean() * 100:.1f}%  max balance ${balances.max():,.2f}")
+    print(f"Revenue needed to keep {share:.0%}: ${payout_rate / (1 - share):,.4f}/player-hour")
+
+    if revenue_per_player_hour:
+        edge = 1 - payout_rate / revenue_per_player_hour
+        ok = edge >= share
+        print(f"{'✓' if ok else '✗'} House edge at ${revenue_per_player_hour:,.4f}/player-hour: "
+              f"{edge:.1%} (target {share:.0%})")
+        return ok
+    return True
+
+
+def maze_size(value: str) -> tuple:
+    """--size: WIDTHxHEIGHT, or N for an NxN maze"""
+    parts = value.lower().split("x")
+    try:
+        width, height = (int(parts[0]), int(parts[0])) if len(parts) == 1 else (int(parts[0]), int(parts[1]))
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT (e.g. 20x20) or N, got {value!r}")
+    if len(parts) > 2 or width < 1 or height < 1:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT (e.g. 20x20) or N, got {value!r}")
+    return width, height
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maze-id", type=int, help="load this maze's layout and chances from the database")
+    parser.add_argument("--size", type=maze_size, default=f"{settings.DEFAULT_MAZE_SIZE}x{settings.DEFAULT_MAZE_SIZE}",
+                        help="generate a WIDTHxHEIGHT (or NxN for N) layout instead (default %(default)s)")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--players-per-maze", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=1000, help="room moves per player")
+    parser.add_argument("--step-seconds", type=float, default=3.0, help="seconds per room move")
+    parser.add_argument("--big-chance", type=float, help="override the maze's big_reward_chance")
+    parser.add_argument("--small-chance", type=float, help="override the maze's small_reward_chance")
+    parser.add_argument("--trap-density", type=float, default=settings.TRAP_DENSITY,
+                        help="share of rooms holding a trap (default TRAP_DENSITY)")
+    parser.add_argument("--trap-lifetime", type=float, default=settings.TRAP_LIFETIME,
+                        help="seconds; 0 = until triggered (default TRAP_LIFETIME)")
+    parser.add_argument("--revenue-per-player-hour", type=float, default=0.0,
+                        help="compare the house edge against COMPANY_REVENUE_SHARE")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.maze_id is not None:
+        layout = asyncio.run(load_layout(args.maze_id))
+        source = f"maze {args.maze_id}"
+    else:
+        width, height = args.size
+        layout = generate_layout(width, height)
+        source = "generated"
+    if args.big_chance is not None:
+        layout.big_chance = args.big_chance
+    if args.small_chance is not None:
+        layout.small_chance = args.small_chance
+
+    print("=" * 60)
+    print(f"Economy simulation - {layout.width}x{layout.height} ({source}), "
+          f"{args.players} players x {args.steps} steps")
+    print(f"big_chance={layout.big_chance} small_chance={layout.small_chance} "
+          f"trap_density={args.trap_density} trap_lifetime={args.trap_lifetime or '-'}")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    stats = simulate(
+        layout,
+        args.players,
+        args.players_per_maze,
+        args.steps,
+        args.step_seconds,
+        args.trap_density,
+        args.trap_lifetime,
+        args.seed
+    )
+    elapsed = time.perf_counter() - started
+
+    return 0 if report(stats, args.steps, args.step_seconds, elapsed, args.revenue_per_player_hour) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
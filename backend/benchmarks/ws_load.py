@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+WebSocket load generator for one backend worker.
+Seeds a throwaway database with N players spread over the rooms of one
+maze, starts the app under uvicorn in a subprocess and opens N real /ws
+clients against it. Every client moves at --move-hz and chats at
+--chat-rate, so position snapshots, chat broadcasts and the handshake go
+through ConnectionManager's real code paths.
+
+Reports connects per second, end-to-end fan-out latency percentiles
+(pose sent -> snapshot received, chat sent -> chat received), frames per
+second, and the server's CPU and RSS per connection (from /proc). Latency
+is sampled on --observers clients per room so the load generator itself
+stays cheap; if its own CPU is near 100% the numbers are client-bound.
+
+Usage (from backend/):
+    python -m benchmarks.ws_load                                  # 500 clients, 20 rooms
+    python -m benchmarks.ws_load --clients 2000 --rooms 50 --duration 30
+    python -m benchmarks.ws_load --hot-share 0.5 --binary          # half the players in one room
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import secrets
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+_db_dir = tempfile.mkdtemp(prefix="maze-ws-load-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ["SECRET_KEY"] = secrets.token_urlsafe(32)  # the server must accept our tokens
+os.environ["TRAP_DENSITY"] = "0"
+os.environ["DEBUG"] = "true"  # opens /metrics, read for the server-side counters
+
+import httpx  # noqa: E402
+import websockets  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+import database  # noqa: E402
+database.engine.echo = False
+
+import pose_codec  # noqa: E402
+from database import init_db, async_session  # noqa: E402
+from models.game_session import GameSession  # noqa: E402
+from models.maze import Room  # noqa: E402
+from models.user import User  # noqa: E402
+from services.auth import AuthService  # noqa: E402
+from services.maze import MazeService  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+# Poses carry a per-client sequence code in pos_x so receivers can look up when it was sent
+CODES = 4000
+_snapshot_header = struct.Struct("<BH")
+_entry_header = struct.Struct("<HB")
+_field_sizes = (2, 2, 2, 2, 2)
+
+
+def code_to_x(code: int) -> float:
+    return code / 500.0 - 4.0
+
+
+def x_to_code(x: float) -> int:
+    return int(round((x + 4.0) * 500.0)) % CODES
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def proc_stats(pid: int) -> tuple:
+    """(cpu seconds, rss MiB) of a process"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+    return cpu, rss
+
+
+async def setup(clients: int, rooms: int, hot_share: float) -> list:
+    """Maze, users and active sessions; returns (user_id, token, (x, y)) per client"""
+    await init_db()
+    async with async_session() as db:
+        side = max(2, int(rooms ** 0.5 + 0.999))
+        maze = await MazeService(db).create_maze(name="load", width=side, height=side, portal_count=0)
+        await db.commit()
+        cells = (await db.execute(
+            select(Room.x, Room.y).where(Room.maze_id == maze.id).order_by(Room.x, Room.y)
+        )).all()[:rooms]
+
+        await db.execute(insert(User), [
+            {"username": f"load{i}", "email": f"load{i}@example.com", "hashed_password": "x"}
+            for i in range(clients)
+        ])
+        user_ids = (await db.execute(select(User.id).order_by(User.id))).scalars().all()
+
+        placement = [
+            cells[0] if i < clients * hot_share else cells[i % len(cells)]
+            for i in range(clients)
+        ]
+        await db.execute(insert(GameSession), [
+            {
+                "user_id": user_id,
+                "maze_id": maze.id,
+                "session_token": secrets.token_urlsafe(16),
+                "current_room_x": x,
+                "current_room_y": y
+            }
+            for user_id, (x, y) in zip(user_ids, placement)
+        ])
+        await db.commit()
+
+    return [
+        (user_id, AuthService.create_access_token({"sub": str(user_id)}), tuple(cell))
+        for user_id, cell in zip(user_ids, placement)
+    ]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_server(port: int) -> subprocess.Popen:
+    log = open(os.path.join(_db_dir, "server.log"), "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT
+    )
+    async with httpx.AsyncClient() as client:
+        for _ in range(300):
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited, see {log.name}")
+            try:
+                await client.get(f"http://127.0.0.1:{port}/health")
+                return server
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+class Stats:
+    def __init__(self):
+        self.sent_at = {}  # user_id -> [send time per pose code]
+        self.slots = {}  # slot -> user_id (binary snapshots)
+        self.pose_latency = []
+        self.chat_latency = []
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.frames_out = 0
+        self.rate_hints = 0
+        self.errors = 0
+        self.measuring = False
+
+
+class LoadClient:
+    """One simulated player: a reader task and a writer loop on a real WebSocket"""
+
+    def __init__(self, user_id: int, token: str, observer: bool, stats: Stats, args):
+        self.user_id = user_id
+        self.token = token
+        self.observer = observer
+        self.stats = stats
+        self.args = args
+        self.ws = None
+        self.stats.sent_at[user_id] = [0.0] * CODES
+
+    async def connect(self, url: str):
+        subprotocols = [pose_codec.SUBPROTOCOL] if self.args.binary else None
+        self.ws = await websockets.connect(
+            f"{url}?token={self.token}", subprotocols=subprotocols, ping_interval=None, max_queue=None
+        )
+
+    async def read(self):
+        stats = self.stats
+        try:
+            async for frame in self.ws:
+                stats.frames_in += 1
+                stats.bytes_in += len(frame)
+                if isinstance(frame, bytes):
+                    if self.observer and stats.measuring:
+                        self._binary_snapshot(frame)
+                    continue
+                if not self.observer and '"rate_hint"' not in frame and '"slot"' not in frame:
+                    continue
+                self._message(json.loads(frame))
+        except websockets.ConnectionClosed:
+            pass
+
+    def _message(self, data: dict):
+        stats = self.stats
+        kind = data.get("type")
+        now = time.perf_counter()
+        if kind == "rate_hint":
+            stats.rate_hints += 1
+        elif kind == "room_players":
+            for player in data["players"]:
+                stats.slots[player["slot"]] = player["user_id"]
+        elif kind == "player_joined":
+            stats.slots[data["slot"]] = data["user_id"]
+        elif not stats.measuring:
+            return
+        elif kind == "room_snapshot":
+            for pose in data["players"]:
+                sent = stats.sent_at.get(pose["user_id"])
+                if sent:
+                    stats.pose_latency.append(now - sent[x_to_code(pose["pos_x"])])
+        elif kind == "chat_message" and data["message"].startswith("load "):
+            stats.chat_latency.append(now - float(data["message"][5:]))
+
+    def _binary_snapshot(self, frame: bytes):
+        stats = self.stats
+        now = time.perf_counter()
+        _, count = _snapshot_header.unpack_from(frame)
+        offset = _snapshot_header.size
+        for _ in range(count):
+            slot, mask = _entry_header.unpack_from(frame, offset)
+            offset += _entry_header.size
+            if mask & 1:
+                qx = struct.unpack_from("<H", frame, offset)[0]
+                sent = stats.sent_at.get(stats.slots.get(slot))
+                if sent:
+                    x = pose_codec.dequantize_pose((qx, 0, 0, 0, 0))[0]
+                    stats.pose_latency.append(now - sent[x_to_code(x)])
+            offset += sum(_field_sizes[i] for i in range(pose_codec.FIELD_COUNT) if mask & (1 << i))
+
+    async def run(self, until: float):
+        """Move at --move-hz (with jitter), chat at --chat-rate per second"""
+        args, stats = self.args, self.stats
+        interval = 1 / args.move_hz
+        sent_at = stats.sent_at[self.user_id]
+        seq = random.randrange(CODES)
+        await asyncio.sleep(random.random() * interval)
+        try:
+            while time.perf_counter() < until:
+                seq = (seq + 1) % CODES
+                x = code_to_x(seq)
+                sent_at[seq] = time.perf_counter()
+                if args.binary:
+                    await self.ws.send(struct.pack("<B3H2h", pose_codec.POSE_UPDATE, *pose_codec.quantize_pose(
+                        x, 1.6, 0.0, 0.0, 0.0)[:3], 0, 0))
+                else:
+                    await self.ws.send(json.dumps({
+                        "type": "position_update", "pos_x": x, "pos_y": 1.6, "pos_z": 0.0, "yaw": 0.0, "pitch": 0.0
+                    }))
+                stats.frames_out += 1
+                if args.chat_rate and random.random() < args.chat_rate * interval:
+                    await self.ws.send(json.dumps({"type": "chat", "message": f"load {time.perf_counter():.6f}"}))
+                    stats.frames_out += 1
+                await asyncio.sleep(interval)
+        except websockets.ConnectionClosed:
+            stats.errors += 1
+
+
+async def main(args) -> int:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))  # the server inherits it
+
+    players = await setup(args.clients, args.rooms, args.hot_share)
+    port = free_port()
+    server = await start_server(port)
+    url = f"ws://127.0.0.1:{port}/ws"
+
+    print("=" * 60)
+    print(
+        f"WebSocket load - {args.clients} clients, {args.rooms} rooms (hot share {args.hot_share:.0%}), "
+        f"{args.move_hz:g} Hz moves, {'binary' if args.binary else 'JSON'} poses"
+    )
+    print("=" * 60)
+
+    stats = Stats()
+    clients = []
+    readers = []
+    try:
+        await asyncio.sleep(0.5)
+        base_cpu, base_rss = proc_stats(server.pid)
+
+        # Connect (observers: the first --observers clients seen in each room)
+        per_room = {}
+        for user_id, token, room in players:
+            per_room[room] = per_room.get(room, 0) + 1
+            clients.append(LoadClient(user_id, token, per_room[room] <= args.observers, stats, args))
+        gate = asyncio.Semaphore(args.connect_concurrency)
+
+        async def connect(client):
+            async with gate:
+                await client.connect(url)
+                readers.append(asyncio.create_task(client.read()))
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(connect(c) for c in clients), return_exceptions=True)
+        connect_time = time.perf_counter() - started
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        clients = [c for c in clients if c.ws is not None]
+        await asyncio.sleep(1.0)
+        _, connected_rss = proc_stats(server.pid)
+        print(
+            f"Connected {len(clients)}/{args.clients} in {connect_time:.2f}s "
+            f"({len(clients) / connect_time:.0f}/s), {failed} failed"
+        )
+
+        # Warm up, then measure a steady window
+        until = time.perf_counter() + args.warmup + args.duration
+        movers = [asyncio.create_task(c.run(until)) for c in clients]
+        await asyncio.sleep(args.warmup)
+        stats.measuring = True
+        frames_in, frames_out = stats.frames_in, stats.frames_out
+        cpu_start, _ = proc_stats(server.pid)
+        client_cpu_start = time.process_time()
+        window_start = time.perf_counter()
+        await asyncio.gather(*movers)
+        window = time.perf_counter() - window_start
+        stats.measuring = False
+        cpu_end, end_rss = proc_stats(server.pid)
+        client_cpu = (time.process_time() - client_cpu_start) / window
+
+        async with httpx.AsyncClient() as http:
+            server_metrics = (await http.get(f"http://127.0.0.1:{port}/metrics")).json()
+    finally:
+        for client in clients:
+            if client.ws is not None:
+                await client.ws.close()
+        for task in readers:
+            task.cancel()
+        server.terminate()
+        server.wait(10)
+
+    pose = sorted(stats.pose_latency)
+    chat = sorted(stats.chat_latency)
+    server_cpu = (cpu_end - cpu_start) / window
+    n = max(1, len(clients))
+
+    print("-" * 60)
+    print(f"Frames in:  {(stats.frames_in - frames_in) / window:,.0f}/s ({stats.bytes_in / 1024 / 1024:.1f} MiB total)")
+    print(f"Frames out: {(stats.frames_out - frames_out) / window:,.0f}/s")
+    for label, values in (("Pose", pose), ("Chat", chat)):
+        if values:
+            print(
+                f"{label} latency ({len(values):,} samples): p50={percentile(values, 0.50) * 1000:.1f}ms "
+                f"p90={percentile(values, 0.90) * 1000:.1f}ms p99={percentile(values, 0.99) * 1000:.1f}ms "
+                f"max={values[-1] * 1000:.1f}ms"
+            )
+    print(
+        f"Server CPU: {server_cpu:.0%} of one core ({server_cpu / n * 1e6:.0f}µs/s per connection), "
+        f"startup {base_cpu:.1f}s"
+    )
+    print(
+        f"Server RSS: {base_rss:.0f} MiB idle, {connected_rss:.0f} MiB connected, {end_rss:.0f} MiB at end "
+        f"({(connected_rss - base_rss) * 1024 / n:.1f} KiB per connection)"
+    )
+    print(f"Load generator CPU: {client_cpu:.0%} of one core{' - results are client-bound' if client_cpu > 0.9 else ''}")
+
+    counters = server_metrics.get("counters", {})
+    print(
+        f"Server: rate_hints={counters.get('ws.rate_hints', 0):.0f} "
+        f"coalesced={counters.get('ws.pose.coalesced', 0):.0f} "
+        f"dropped={counters.get('ws.send_queue.dropped', 0):.0f} "
+        f"handshakes cached/loaded={counters.get('ws.handshake.cached', 0):.0f}/"
+        f"{counters.get('ws.handshake.loaded', 0):.0f}"
+    )
+    tick = server_metrics.get("summaries", {}).get("ws.snapshot.tick_ms")
+    if tick:
+        print(f"Snapshot tick: {json.dumps(tick)}")
+    if stats.errors:
+        print(f"✗ {stats.errors} clients were disconnected during the run")
+    return 1 if failed or stats.errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--rooms", type=int, default=20, help="rooms the players are spread over")
+    parser.add_argument("--hot-share", type=float, default=0.0, help="share of players put in the first room")
+    parser.add_argument("--move-hz", type=float, default=10.0, help="position updates per client per second")
+    parser.add_argument("--chat-rate", type=float, default=0.05, help="chat messages per client per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--observers", type=int, default=2, help="clients per room that record latency")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--binary", action="store_true", help="use the maze-pose-v1 binary sub-protocol")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,192 @@
+import abc
+import asyncio
+import itertools
+import os
+import secrets
+import socket
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+from metrics import metrics
+
+# Called with each payload published by another process
+Handler = Callable[[str], Awaitable[None]]
+
+
+class Broker(abc.ABC):
+    """Cross-process fan-out for WebSocket rooms; publish() never waits on the network"""
+
+    # False when there is nobody else to publish to (callers can skip building payloads)
+    distributed = True
+
+    def __init__(self, maxsize: int = None):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.maxsize = maxsize or settings.BROKER_OUTBOX_SIZE
+        # Bounded outbox in two lanes, like SendQueue: when publishing stalls, pose
+        # payloads are dropped first; the sequence numbers keep the publish order
+        self._control: deque = deque()
+        self._droppable: deque = deque()
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._control) + len(self._droppable)
+
+    async def start(self, handler: Handler):
+        self._tasks.append(asyncio.create_task(self._drain()))
+
+    def publish(self, payload: str, droppable: bool = False):
+        """Queue a payload for every other process (in order); droppable = poses, superseded by the next tick"""
+        if len(self) >= self.maxsize:
+            if self._droppable:
+                self._droppable.popleft()
+                metrics.inc("broker.dropped:poses")
+            elif droppable:
+                metrics.inc("broker.dropped:poses")
+                return
+            else:
+                # Only control payloads left - still never grow without bound
+                metrics.inc("broker.dropped:control")
+                return
+        (self._droppable if droppable else self._control).append((next(self._seq), payload))
+        self._ready.set()
+
+    def _pop(self) -> str:
+        if not self._droppable or (self._control and self._control[0][0] < self._droppable[0][0]):
+            return self._control.popleft()[1]
+        return self._droppable.popleft()[1]
+
+    async def _drain(self):
+        while True:
+            if not len(self):
+                self._ready.clear()
+                await self._ready.wait()
+            payload = self._pop()
+            try:
+                await self._send(payload)
+                metrics.inc("broker.published")
+            except Exception as e:
+                metrics.inc("broker.errors")
+                print(f"Broker publish error: {e}")
+
+    @abc.abstractmethod
+    async def _send(self, payload: str):
+        """Hand one payload to the other processes"""
+
+    async def flush(self):
+        """Wait until everything published so far has been handed off"""
+        while len(self):
+            await asyncio.sleep(0.01)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+
+class LocalBroker(Broker):
+    """Single process: everything is delivered locally, nothing is published"""
+
+    distributed = False
+
+    async def start(self, handler: Handler):
+        pass
+
+    def publish(self, payload: str, droppable: bool = False):
+        pass
+
+    async def _send(self, payload: str):
+        pass
+
+
+class MemoryHub:
+    """In-process stand-in for a pub/sub server, shared by several MemoryBrokers (tests, benchmarks)"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Handler] = {}
+
+    async def deliver(self, sender: str, payload: str):
+        for node_id, handler in list(self.subscribers.items()):
+            if node_id != sender:
+                await handler(payload)
+
+
+# name -> hub, for memory:// URLs
+memory_hubs: Dict[str, MemoryHub] = {}
+
+
+class MemoryBroker(Broker):
+    """Broker on a MemoryHub: several ConnectionManagers in one process act as separate workers"""
+
+    def __init__(self, hub: MemoryHub):
+        super().__init__()
+        self.hub = hub
+
+    async def start(self, handler: Handler):
+        self.hub.subscribers[self.node_id] = handler
+        await super().start(handler)
+
+    async def _send(self, payload: str):
+        await self.hub.deliver(self.node_id, payload)
+
+    async def close(self):
+        self.hub.subscribers.pop(self.node_id, None)
+        await super().close()
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub on one channel; every worker subscribes, each ignores its own messages"""
+
+    def __init__(self, url: str, channel: str = "maze:ws"):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self.redis = None
+        self.pubsub = None
+
+    async def start(self, handler: Handler):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(self.url, decode_responses=True)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(self.channel)
+        self._tasks.append(asyncio.create_task(self._listen(handler)))
+        await super().start(handler)
+
+    async def _listen(self, handler: Handler):
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    if message["type"] == "message":
+                        metrics.inc("broker.received")
+                        await handler(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.inc("broker.errors")
+                print(f"Broker receive error: {e}")
+                await asyncio.sleep(1)
+
+    async def _send(self, payload: str):
+        await self.redis.publish(self.channel, payload)
+
+    async def close(self):
+        await super().close()
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+def create_broker(url: Optional[str]) -> Broker:
+    """'' -> in-process only, memory://<name> -> shared in-process hub, redis://... -> Redis pub/sub"""
+    if not url:
+        return LocalBroker()
+    if url.startswith("memory://"):
+        hub = memory_hubs.setdefault(url[len("memory://"):], MemoryHub())
+        return MemoryBroker(hub)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported BROKER_URL: {url}")
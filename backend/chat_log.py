@@ -0,0 +1,128 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Tuple
+from sqlalchemy import select, insert, delete
+
+from config import settings
+from database import async_session
+from metrics import metrics
+from models.chat import ChatMessage
+
+# (maze_id, room_x, room_y)
+RoomKey = Tuple[int, int, int]
+
+
+class ChatLog:
+    """Recent chat per room in memory (sent to players entering it) and batched, write-behind persistence"""
+
+    def __init__(self):
+        self.history: Dict[RoomKey, Deque[dict]] = {}
+        self.pending: List[dict] = []  # rows not yet inserted
+        self._wakeup = asyncio.Event()
+
+    def remember(self, room_key: RoomKey, message: dict):
+        """Add a chat_message to the room's ring buffer (oldest falls out)"""
+        history = self.history.get(room_key)
+        if history is None:
+            history = self.history[room_key] = deque(maxlen=settings.CHAT_HISTORY_SIZE)
+        history.append(message)
+
+    def add(self, room_key: RoomKey, message: dict, user_id: int, created_at: datetime):
+        """A chat sent on this process: remember it and queue its row for the next batch insert"""
+        self.remember(room_key, message)
+        self.pending.append({
+            "maze_id": room_key[0],
+            "room_x": room_key[1],
+            "room_y": room_key[2],
+            "user_id": user_id,
+            "username": message["username"],
+            "message": message["message"],
+            "created_at": created_at
+        })
+        if len(self.pending) >= settings.CHAT_FLUSH_BATCH:
+            self._wakeup.set()
+
+    def recent(self, room_key: RoomKey) -> List[dict]:
+        history = self.history.get(room_key)
+        return list(history) if history else []
+
+    async def load_recent(self):
+        """Refill the ring buffers from the newest persisted messages (after a restart)"""
+        async with async_session() as db:
+            result = await db.execute(
+                select(ChatMessage)
+                .order_by(ChatMessage.id.desc())
+                .limit(settings.CHAT_HISTORY_WARM)
+            )
+            rows = result.scalars().all()
+
+        for row in reversed(rows):
+            self.remember((row.maze_id, row.room_x, row.room_y), {
+                "type": "chat_message",
+                "user_id": row.user_id,
+                "username": row.username,
+                "message": row.message,
+                "timestamp": row.created_at.isoformat()
+            })
+
+    async def flush(self):
+        """Insert everything pending in one multi-row INSERT"""
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+        try:
+            async with async_session() as db:
+                await db.execute(insert(ChatMessage), rows)
+                await db.commit()
+            metrics.inc("chat.persisted", len(rows))
+        except Exception as e:
+            # Keep them for the next attempt, but never grow without bound while the DB is down
+            retry = rows + self.pending
+            if len(retry) > settings.CHAT_PENDING_MAX:
+                metrics.inc("chat.dropped", len(retry) - settings.CHAT_PENDING_MAX)
+                retry = retry[-settings.CHAT_PENDING_MAX:]
+            self.pending = retry
+            metrics.inc("chat.persist_errors")
+            print(f"Chat persist error ({len(rows)} messages): {e}")
+
+    async def run(self):
+        """Background task (every worker): flush every CHAT_FLUSH_INTERVAL, or sooner when a batch is full"""
+        try:
+            await self.load_recent()
+        except Exception as e:
+            print(f"Chat history load error: {e}")
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.CHAT_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            metrics.set_gauge("chat.pending", len(self.pending))
+
+    async def purge(self) -> int:
+        """Delete messages older than CHAT_RETENTION_DAYS"""
+        cutoff = datetime.utcnow() - timedelta(days=settings.CHAT_RETENTION_DAYS)
+        async with async_session() as db:
+            result = await db.execute(delete(ChatMessage).where(ChatMessage.created_at < cutoff))
+            await db.commit()
+        return result.rowcount
+
+    async def run_retention(self):
+        """Singleton job (leader only): purge expired chat every CHAT_PURGE_INTERVAL"""
+        if settings.CHAT_RETENTION_DAYS <= 0:
+            return
+        while True:
+            try:
+                purged = await self.purge()
+                if purged:
+                    metrics.inc("chat.purged", purged)
+            except Exception as e:
+                print(f"Chat purge error: {e}")
+            await asyncio.sleep(settings.CHAT_PURGE_INTERVAL)
+
+
+# Global chat log
+chat_log = ChatLog()
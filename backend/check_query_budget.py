@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Query budget check for the hot endpoints of the 3D Maze Game backend.
+Runs each endpoint against a throwaway SQLite database and fails if it
+executes more statements than its budget (catches N+1 regressions).
+
+Usage:
+    python check_query_budget.py            # check budgets
+    python check_query_budget.py --report   # print counts and statements
+"""
+
+import os
+import sys
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="maze-query-budget-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'budget.db')}"
+os.environ["TRAP_DENSITY"] = "0"  # randomly placed traps would make the move budget flaky
+
+import asyncio  # noqa: E402
+
+import database  # noqa: E402
+database.engine.echo = False
+
+import httpx  # noqa: E402
+
+import db_stats  # noqa: E402
+from main import app  # noqa: E402
+from websocket_handler import manager, handle_message, resolve_handshake  # noqa: E402
+
+
+# Maximum statements per request / message
+QUERY_BUDGETS = {
+    "POST /api/maze/start": 9,
+    "POST /api/maze/move": 13,
+    "GET /api/maze/current": 7,
+    "GET /api/maze/visited": 3,
+    "GET /api/character/me": 2,
+    "WS connect (cold)": 4,
+    "WS connect (warm)": 0,
+    "WS position_update": 0,
+    "WS room_change": 0,
+    "WS chat": 0,
+}
+
+
+class BudgetWebSocket:
+    """Minimal stand-in for a client socket; the app code paths stay real"""
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+
+async def run_budget(label: str, coro_fn, report: bool) -> bool:
+    try:
+        with db_stats.assert_max_queries(QUERY_BUDGETS[label], label) as stats:
+            await coro_fn()
+    except AssertionError as e:
+        print(f"✗ {e}")
+        return False
+
+    print(f"✓ {label}: {stats.count} queries (budget {QUERY_BUDGETS[label]})")
+    if report:
+        for statement in stats.statements:
+            print(f"    {statement.splitlines()[0]}")
+    return True
+
+
+async def check_budgets(report: bool) -> bool:
+    all_ok = True
+    transport = httpx.ASGITransport(app=app)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+            await client.post("/api/auth/register", json={
+                "username": "budget",
+                "email": "budget@example.com",
+                "password": "budget-password"
+            })
+            response = await client.post("/api/auth/login", data={
+                "username": "budget@example.com",
+                "password": "budget-password"
+            })
+            token = response.json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            state = {}
+
+            async def start():
+                response = await client.post("/api/maze/start", headers=headers)
+                state["session_token"] = response.json()["session_token"]
+                state["doors"] = response.json()["room"]["doors"]
+
+            async def move():
+                direction = next(d for d, is_open in state["doors"].items() if is_open)
+                await client.post(
+                    f"/api/maze/move?session_token={state['session_token']}",
+                    json={"direction": direction},
+                    headers=headers
+                )
+
+            checks = [
+                ("POST /api/maze/start", start),
+                ("POST /api/maze/move", move),
+                ("GET /api/maze/current", lambda: client.get(
+                    f"/api/maze/current?session_token={state['session_token']}", headers=headers)),
+                ("GET /api/maze/visited", lambda: client.get(
+                    f"/api/maze/visited?session_token={state['session_token']}", headers=headers)),
+                ("GET /api/character/me", lambda: client.get("/api/character/me", headers=headers)),
+            ]
+            for label, fn in checks:
+                all_ok = await run_budget(label, fn, report) and all_ok
+
+        # First connect loads user, session, character and door grid; a reconnect hits the cache
+        for label in ("WS connect (cold)", "WS connect (warm)"):
+            all_ok = await run_budget(label, lambda: resolve_handshake(token), report) and all_ok
+        principal, session, character_data = await resolve_handshake(token)
+
+        websocket = BudgetWebSocket()
+        await manager.connect(
+            websocket, principal.user_id, principal.username, session.session_id,
+            session.maze_id, session.room_x, session.room_y, character_data
+        )
+
+        ws_checks = [
+            ("WS position_update", {"type": "position_update", "pos_x": 1, "pos_z": 2}),
+            ("WS room_change", {"type": "room_change", "room_x": 0, "room_y": 0}),
+            ("WS chat", {"type": "chat", "message": "hello"}),
+        ]
+        for label, message in ws_checks:
+            all_ok = await run_budget(
+                label,
+                lambda message=message: handle_message(websocket, message["type"], message),
+                report
+            ) and all_ok
+
+        await manager.disconnect(websocket)
+
+    return all_ok
+
+
+def main():
+    report = "--report" in sys.argv
+
+    print("=" * 60)
+    print("3D Maze Game Backend - Query Budgets")
+    print("=" * 60)
+
+    all_ok = asyncio.run(check_budgets(report))
+
+    print("-" * 60)
+    if all_ok:
+        print("✓ All endpoints are within their query budgets")
+        return 0
+    print("✗ Some endpoints exceeded their query budgets")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
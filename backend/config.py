@@ -7,6 +7,9 @@ import secrets
 class Settings(BaseSettings):
     model_config = ConfigDict(extra='ignore')  # Ignore extra fields from .env
 
+    # Debug (adds X-DB-* diagnostic headers to responses)
+    DEBUG: bool = False
+
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./maze.db"
 
@@ -28,6 +31,67 @@ class Settings(BaseSettings):
     SMALL_REWARD_SPAWN_CHANCE: float = 0.05  # 5%
     BIG_REWARD_DURATION: int = 3  # seconds
     SMALL_REWARD_DURATION: int = 10  # seconds
+    REWARD_SPAWN_INTERVAL: int = 10  # seconds; a maze's spawn chance applies per interval
+    REWARD_MAZE_REFRESH_INTERVAL: int = 30  # seconds between active maze reloads
+    REWARD_SCHEDULER_CONCURRENCY: int = 8  # mazes processed in parallel
+    REWARD_MAZE_TIME_BUDGET: float = 5.0  # seconds one maze's spawn/expiry pass may take
+    REWARD_LATE_THRESHOLD: float = 1.0  # seconds past its deadline before an event counts as late
+
+    # Trap Settings
+    TRAP_DENSITY: float = 0.03  # share of a maze's rooms holding a live trap (0 disables spawning)
+    TRAP_LIFETIME: int = 300  # seconds before an untriggered trap expires (0 = never)
+    TRAP_SYNC_INTERVAL: int = 10  # seconds between polls for triggered traps and maze changes
+
+    # WebSocket position snapshots
+    WS_SNAPSHOT_HZ: float = 15.0  # room_snapshot frames per second (caps pose messages per client)
+    WS_NEIGHBOUR_SNAPSHOT_EVERY: int = 3  # players in door-connected rooms are sent every Nth tick
+
+    # Inbound position updates
+    WS_POSE_RATE: float = 20.0  # sustained position updates per second per client (token bucket refill)
+    WS_POSE_BURST: int = 10  # bucket size; over-budget poses are coalesced into the next tick
+    WS_POSE_INTERVAL_MS: int = 100  # client send interval when the room is quiet (rate_hint baseline)
+    WS_CROWDED_ROOM: int = 8  # players in a room above which clients are asked to send less often
+    WS_LOADED_LAG: float = 0.02  # event loop lag (seconds, averaged) above which the process counts as loaded
+
+    # WebSocket handshake cache (token -> user, active session, character payload)
+    WS_HANDSHAKE_CACHE_TTL: int = 600  # seconds an entry is trusted (changes also invalidate it)
+    WS_HANDSHAKE_CACHE_SIZE: int = 10000  # entries per table before the oldest are evicted
+
+    # Live poses are written to player_positions in one upsert per interval (and on shutdown)
+    WS_POSITION_FLUSH_INTERVAL: float = 5.0
+    WS_POSITION_FLUSH_ATTEMPTS: int = 5  # a row failing this many flushes in a row is dropped
+
+    # Appearance hash -> character registry (messages carry the hash, clients cache by it)
+    APPEARANCE_REGISTRY_SIZE: int = 50000
+
+    # Cross-process WebSocket fan-out: "" = single process, redis://host:6379/0, memory://<name> (tests)
+    BROKER_URL: str = ""
+    BROKER_OUTBOX_SIZE: int = 10000  # payloads waiting to be published; poses are dropped first when full
+
+    # WebSocket heartbeats (idle connection reaper)
+    WS_HEARTBEAT_IDLE: float = 25.0  # seconds without any frame from a client before the server pings it
+    WS_HEARTBEAT_TIMEOUT: float = 10.0  # seconds to answer the ping before the connection is evicted
+    WS_HEARTBEAT_TICK: float = 1.0  # seconds per reaper timing wheel slot (eviction granularity)
+
+    # WebSocket send queues
+    WS_SEND_QUEUE_SIZE: int = 256  # messages buffered per client before position updates are dropped
+    WS_SEND_FULL_TIMEOUT: float = 5.0  # seconds a queue may stay full before the client is disconnected
+
+    # Room chat
+    CHAT_HISTORY_SIZE: int = 20  # recent messages per room sent to players entering it
+    CHAT_HISTORY_WARM: int = 5000  # newest persisted messages reloaded into the room buffers on startup
+    CHAT_FLUSH_INTERVAL: float = 2.0  # seconds between batched chat inserts
+    CHAT_FLUSH_BATCH: int = 200  # pending messages that trigger an early insert
+    CHAT_PENDING_MAX: int = 10000  # messages kept for retry while the DB is unavailable
+    CHAT_RETENTION_DAYS: int = 30  # persisted chat older than this is deleted (0 = keep forever)
+    CHAT_PURGE_INTERVAL: int = 3600  # seconds between retention purges (leader only)
+
+    # Trap effects
+    EFFECT_TICK: float = 0.25  # seconds per effect timing wheel slot
+
+    # Leader election (singleton background jobs across workers)
+    LEADER_LEASE_TTL: int = 15  # seconds; failover happens within this
+    LEADER_LEASE_RENEW_INTERVAL: int = 5  # seconds
 
     # Company Revenue Share
     COMPANY_REVENUE_SHARE: float = 0.3  # 30%
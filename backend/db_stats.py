@@ -0,0 +1,73 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class QueryStats:
+    """Statements executed (and time spent in the driver) within one unit of work"""
+
+    __slots__ = ("count", "duration", "statements", "parent")
+
+    def __init__(self, record_statements: bool = False, parent: Optional["QueryStats"] = None):
+        self.parent = parent  # enclosing tracker, so nested blocks count towards both
+        self.count = 0
+        self.duration = 0.0  # seconds
+        self.statements: Optional[List[str]] = [] if record_statements else None
+
+    @property
+    def duration_ms(self) -> float:
+        return round(self.duration * 1000, 3)
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("db_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    elapsed = time.perf_counter() - started
+    stats = _current_stats.get()
+    while stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        if stats.statements is not None:
+            stats.statements.append(statement)
+        stats = stats.parent
+
+
+def install(engine: AsyncEngine):
+    """Attach statement counting hooks to an engine"""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def track(record_statements: bool = False):
+    """Count statements executed in the current context (request, WS message, ...)"""
+    stats = QueryStats(record_statements, parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = ""):
+    """Fail if the wrapped block executes more than `limit` statements"""
+    with track(record_statements=True) as stats:
+        yield stats
+
+    if stats.count > limit:
+        listing = "\n".join(f"  {i + 1}. {s.splitlines()[0]}" for i, s in enumerate(stats.statements))
+        raise AssertionError(
+            f"{label or 'block'} executed {stats.count} queries (limit {limit}):\n{listing}"
+        )
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.maze import Room
+
+
+# direction -> (bit, dx, dy); north is +y, as in MazeService.move_player
+DIRECTIONS = {
+    "north": (1, 0, 1),
+    "south": (2, 0, -1),
+    "east": (4, 1, 0),
+    "west": (8, -1, 0),
+}
+
+
+class DoorGrid:
+    """Door layout of one maze: (x, y) -> bitmask of its open doors"""
+
+    __slots__ = ("doors",)
+
+    def __init__(self, doors: Dict[Tuple[int, int], int]):
+        self.doors = doors
+
+    def neighbours(self, x: int, y: int) -> List[Tuple[int, int]]:
+        """Rooms reachable (and visible) through an open door of (x, y)"""
+        mask = self.doors.get((x, y), 0)
+        return [
+            (x + dx, y + dy) for bit, dx, dy in DIRECTIONS.values()
+            if mask & bit and (x + dx, y + dy) in self.doors
+        ]
+
+
+class DoorGridCache:
+    """Per-process door grids; doors never change after a maze is generated"""
+
+    def __init__(self):
+        self.grids: Dict[int, DoorGrid] = {}
+
+    def get(self, maze_id: int) -> Optional[DoorGrid]:
+        return self.grids.get(maze_id)
+
+    async def load(self, db: AsyncSession, maze_id: int) -> DoorGrid:
+        """Cached grid, or one SELECT of the maze's rooms on a miss"""
+        grid = self.grids.get(maze_id)
+        if grid is None:
+            result = await db.execute(
+                select(Room.x, Room.y, Room.door_north, Room.door_south, Room.door_east, Room.door_west)
+                .where(Room.maze_id == maze_id)
+            )
+            grid = DoorGrid({
+                (x, y): sum(bit for bit, is_open in zip((1, 2, 4, 8), doors) if is_open)
+                for x, y, *doors in result.all()
+            })
+            self.grids[maze_id] = grid
+        return grid
+
+    def invalidate(self, maze_id: int):
+        self.grids.pop(maze_id, None)
+
+
+# Global door grid cache
+door_grids = DoorGridCache()
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import update
+
+from config import settings
+from database import async_session
+from metrics import metrics
+from models.game_session import GameSession
+from models.trap import TrapType
+from timers import TimingWheel
+
+
+# Trap types whose effect lasts for the trap's duration (the others act once)
+TIMED_EFFECTS = (
+    TrapType.FREEZE.value,
+    TrapType.BLIND.value,
+    TrapType.SLOW.value,
+    TrapType.REVERSE_CONTROLS.value,
+)
+
+
+class ActiveEffect:
+    """A timed trap effect on one game session"""
+
+    __slots__ = ("session_id", "user_id", "effect_type", "ends_at", "params")
+
+    def __init__(self, session_id: int, user_id: int, effect_type: str, ends_at: datetime, params: dict):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.effect_type = effect_type
+        self.ends_at = ends_at
+        self.params = params
+
+    def to_dict(self) -> dict:
+        return {
+            "effect": self.effect_type,
+            "ends_at": self.ends_at.isoformat(),
+            "remaining": max(0.0, (self.ends_at - datetime.utcnow()).total_seconds()),
+            **self.params
+        }
+
+
+class EffectEngine:
+    """Active timed effects per session; a timing wheel ends them, the DB is touched only at boundaries"""
+
+    def __init__(self):
+        self.wheel = TimingWheel(settings.EFFECT_TICK)
+        # session_id -> {effect_type: effect}
+        self.effects: Dict[int, Dict[str, ActiveEffect]] = {}
+
+    async def start(
+        self,
+        session_id: int,
+        user_id: int,
+        effect_type: str,
+        duration: float,
+        params: dict = None
+    ) -> Optional[ActiveEffect]:
+        """Start (or restart) a timed effect and tell the player"""
+        if effect_type not in TIMED_EFFECTS or duration <= 0:
+            return None
+
+        effect = ActiveEffect(
+            session_id,
+            user_id,
+            effect_type,
+            datetime.utcnow() + timedelta(seconds=duration),
+            params or {}
+        )
+        self.effects.setdefault(session_id, {})[effect_type] = effect
+        self.wheel.schedule((session_id, effect_type), time.monotonic() + duration, effect)
+        metrics.inc(f"effects.started:{effect_type}")
+
+        await self._notify(user_id, {"type": "effect_started", **effect.to_dict()})
+        return effect
+
+    async def _notify(self, user_id: int, message: dict):
+        # Imported here: websocket_handler -> services -> trap -> effects would be circular
+        from websocket_handler import manager
+        await manager.send_to_user(user_id, message)
+
+    def get_effects(self, session_id: int) -> List[ActiveEffect]:
+        now = datetime.utcnow()
+        return [e for e in self.effects.get(session_id, {}).values() if e.ends_at > now]
+
+    def has_effect(self, session_id: int, effect_type: str) -> bool:
+        """In-memory check; exact even between wheel ticks"""
+        effect = self.effects.get(session_id, {}).get(effect_type)
+        return effect is not None and effect.ends_at > datetime.utcnow()
+
+    async def _end(self, ended: List[ActiveEffect]):
+        thawed = []
+        for effect in ended:
+            effects = self.effects.get(effect.session_id)
+            if effects and effects.get(effect.effect_type) is effect:
+                del effects[effect.effect_type]
+                if not effects:
+                    del self.effects[effect.session_id]
+
+            if effect.effect_type == TrapType.FREEZE.value:
+                thawed.append(effect.session_id)
+            metrics.inc(f"effects.ended:{effect.effect_type}")
+            await self._notify(effect.user_id, {"type": "effect_ended", "effect": effect.effect_type})
+
+        if thawed:
+            # Persist the boundary once for every freeze that ended this tick;
+            # skip sessions frozen again in the meantime (possibly by another worker)
+            async with async_session() as db:
+                await db.execute(
+                    update(GameSession)
+                    .where(
+                        GameSession.id.in_(thawed),
+                        GameSession.frozen_until <= datetime.utcnow()
+                    )
+                    .values(is_frozen=False, frozen_until=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+    async def run(self):
+        """Background task: advance the wheel every EFFECT_TICK seconds"""
+        while True:
+            await asyncio.sleep(settings.EFFECT_TICK)
+            ended = [effect for _, effect in self.wheel.advance(time.monotonic())]
+            metrics.set_gauge("effects.active", len(self.wheel))
+            if not ended:
+                continue
+
+            try:
+                await self._end(ended)
+            except Exception as e:
+                metrics.inc("effects.errors")
+                print(f"Effect engine error: {e}")
+
+
+# Global effect engine
+effect_engine = EffectEngine()
@@ -0,0 +1,129 @@
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import settings
+
+# get_character() result when nothing is cached (None means "user has no character")
+MISSING: Any = object()
+
+
+class Principal:
+    """What the WebSocket handshake needs from a token and its User row"""
+
+    __slots__ = ("user_id", "username", "expires_at")
+
+    def __init__(self, user_id: int, username: str, expires_at: float):
+        self.user_id = user_id
+        self.username = username
+        self.expires_at = expires_at
+
+
+class ActiveSession:
+    """A user's latest active GameSession (the columns the handshake reads)"""
+
+    __slots__ = ("session_id", "maze_id", "room_x", "room_y", "expires_at")
+
+    def __init__(self, session_id: int, maze_id: int, room_x: int, room_y: int, expires_at: float):
+        self.session_id = session_id
+        self.maze_id = maze_id
+        self.room_x = room_x
+        self.room_y = room_y
+        self.expires_at = expires_at
+
+
+class HandshakeCache:
+    """Per-process cache of everything /ws looks up on connect, so reconnects skip the DB.
+
+    Entries expire after WS_HANDSHAKE_CACHE_TTL; sessions and characters are also
+    forgotten when they change, on every process (see ConnectionManager.start_broker).
+    """
+
+    def __init__(self):
+        self.principals: Dict[str, Principal] = {}  # token -> principal
+        self.sessions: Dict[int, ActiveSession] = {}  # user_id -> session
+        self.characters: Dict[int, tuple] = {}  # user_id -> (payload, expires_at)
+        # Bumped by every forget; a load that raced with one doesn't store its result
+        self.generation = 0
+        # Tells the other processes about a forget: (what, user_id)
+        self.on_forget: Optional[Callable[[str, int], None]] = None
+
+    def _expiry(self) -> float:
+        return time.time() + settings.WS_HANDSHAKE_CACHE_TTL
+
+    def _bounded(self, entries: dict):
+        # Dicts keep insertion order, so the first key is the oldest entry
+        while len(entries) > settings.WS_HANDSHAKE_CACHE_SIZE:
+            del entries[next(iter(entries))]
+
+    def get_principal(self, token: str) -> Optional[Principal]:
+        principal = self.principals.get(token)
+        if principal is not None and principal.expires_at <= time.time():
+            del self.principals[token]
+            return None
+        return principal
+
+    def put_principal(self, token: str, user_id: int, username: str, token_exp: Optional[float]) -> Principal:
+        # Never outlive the token itself
+        expires_at = min(self._expiry(), token_exp) if token_exp else self._expiry()
+        principal = Principal(user_id, username, expires_at)
+        self.principals[token] = principal
+        self._bounded(self.principals)
+        return principal
+
+    def get_session(self, user_id: int) -> Optional[ActiveSession]:
+        session = self.sessions.get(user_id)
+        if session is not None and session.expires_at <= time.time():
+            del self.sessions[user_id]
+            return None
+        return session
+
+    def put_session(
+        self, user_id: int, session_id: int, maze_id: int, room_x: int, room_y: int, generation: int
+    ) -> ActiveSession:
+        session = ActiveSession(session_id, maze_id, room_x, room_y, self._expiry())
+        if generation == self.generation:
+            self.sessions[user_id] = session
+            self._bounded(self.sessions)
+        return session
+
+    def move_session(self, user_id: int, maze_id: int, room_x: int, room_y: int):
+        """Keep the cached room in step with GameSession.current_room_x/y"""
+        session = self.sessions.get(user_id)
+        if session is not None and session.maze_id == maze_id:
+            session.room_x = room_x
+            session.room_y = room_y
+
+    def get_character(self, user_id: int) -> Optional[dict]:
+        entry = self.characters.get(user_id)
+        if entry is None:
+            return MISSING
+        if entry[1] <= time.time():
+            del self.characters[user_id]
+            return MISSING
+        return entry[0]
+
+    def put_character(self, user_id: int, payload: Optional[dict], generation: int) -> Optional[dict]:
+        if generation == self.generation:
+            self.characters[user_id] = (payload, self._expiry())
+            self._bounded(self.characters)
+        return payload
+
+    def forget(self, what: str, user_id: int, publish: bool = True):
+        """Drop a user's cached "session" or "character" here and (by default) on the other processes"""
+        self.generation += 1
+        if what == "session":
+            self.sessions.pop(user_id, None)
+        elif what == "character":
+            self.characters.pop(user_id, None)
+        if publish and self.on_forget is not None:
+            self.on_forget(what, user_id)
+
+    def forget_session(self, user_id: int):
+        self.forget("session", user_id)
+
+    def forget_character(self, user_id: int):
+        self.forget("character", user_id)
+
+
+# Global handshake cache
+handshake_cache = HandshakeCache()
@@ -1,73 +1,25 @@
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, Depends
+from fastapi import Depends, FastAPI, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import init_db, get_db
+import db_stats
+from config import settings
+from database import init_db
+from metrics import metrics
 from routes.auth import router as auth_router
 from routes.maze import router as maze_router
 from routes.room import router as room_router
 from routes.character import router as character_router
-from routes.admin import router as admin_router
+from routes.admin import router as admin_router, get_admin_user
 from websocket_handler import websocket_endpoint, manager
 from services.maze import MazeService
-from services.reward import RewardService
-
-
-async def reward_spawner_task():
-    """Background task to spawn rewards periodically"""
-    from database import async_session
-    from models.maze import Maze
-    from sqlalchemy import select
-
-    while True:
-        try:
-            async with async_session() as db:
-                # Get active mazes (there can be multiple)
-                result = await db.execute(
-                    select(Maze).where(Maze.is_active == True)
-                )
-                mazes = result.scalars().all()
-
-                # Process each active maze
-                for maze in mazes:
-                    reward_service = RewardService(db)
-
-                    # Expire old rewards
-                    await reward_service.expire_old_rewards(maze.id)
-
-                    # Try to spawn rewards based on probability
-                    if await reward_service.should_spawn_reward(maze, "big"):
-                        reward = await reward_service.spawn_big_reward(maze.id)
-                        if reward:
-                            await manager.notify_reward_spawn(
-                                maze.id,
-                                reward.room_x,
-                                reward.room_y,
-                                reward.reward_type,
-                                reward.amount,
-                                reward.expires_at
-                            )
-
-                    if await reward_service.should_spawn_reward(maze, "small"):
-                        reward = await reward_service.spawn_small_reward(maze.id)
-                        if reward:
-                            await manager.notify_reward_spawn(
-                                maze.id,
-                                reward.room_x,
-                                reward.room_y,
-                                reward.reward_type,
-                                reward.amount,
-                                reward.expires_at
-                            )
-
-        except Exception as e:
-            print(f"Reward spawner error: {e}")
-
-        # Check every 10 seconds
-        await asyncio.sleep(10)
+from tasks.reward_scheduler import reward_scheduler
+from tasks.trap_scheduler import trap_scheduler
+from tasks.leader import leader_elector
+from chat_log import chat_log
+from effects import effect_engine
 
 
 @asynccontextmanager
@@ -100,17 +52,35 @@ async def lifespan(app: FastAPI):
             await db.commit()
             print("Default maze created successfully!")
 
-    # Start background tasks
-    reward_task = asyncio.create_task(reward_spawner_task())
+    # Cross-process room fan-out (in-process only unless BROKER_URL is set)
+    await manager.start_broker()
+
+    # Start background tasks (singleton jobs only run on the elected worker)
+    leader_elector.add_job(reward_scheduler.run)
+    leader_elector.add_job(trap_scheduler.run)
+    leader_elector.add_job(chat_log.run_retention)
+    background_tasks = [
+        asyncio.create_task(leader_elector.run()),
+        # Per-worker tasks
+        asyncio.create_task(effect_engine.run()),
+        asyncio.create_task(manager.run_snapshots()),
+        asyncio.create_task(manager.run_heartbeats()),
+        asyncio.create_task(manager.run_position_flush()),
+        asyncio.create_task(chat_log.run()),
+    ]
 
     yield
 
     # Shutdown
-    reward_task.cancel()
-    try:
-        await reward_task
-    except asyncio.CancelledError:
-        pass
+    for task in background_tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await chat_log.flush()  # chat still waiting for its batch insert
+    await manager.flush_positions()  # latest poses since the last write-behind flush
+    await manager.stop_broker()
 
 
 app = FastAPI(
@@ -129,6 +99,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def db_query_stats_middleware(request: Request, call_next):
+    """Count DB statements per request; expose as metrics (and headers in debug mode)"""
+    with db_stats.track() as stats:
+        response = await call_next(request)
+
+    route = request.scope.get("route")
+    if route is not None and request.url.path.startswith("/api/"):
+        metrics.observe(f"http.db_queries:{request.method} {route.path}", stats.count)
+        metrics.observe(f"http.db_time_ms:{request.method} {route.path}", stats.duration_ms)
+
+    if settings.DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = str(stats.duration_ms)
+
+    return response
+
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(maze_router)
@@ -136,21 +125,12 @@ app.include_router(room_router)
 app.include_router(character_router)
 app.include_router(admin_router)
 
-# Mount static files (frontend)
-import os
-frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)))
-if os.path.exists(frontend_path):
-    app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
-
 
 # WebSocket endpoint
 @app.websocket("/ws")
-async def websocket_route(
-    websocket: WebSocket,
-    token: str,
-    db: AsyncSession = Depends(get_db)
-):
-    await websocket_endpoint(websocket, token, db)
+async def websocket_route(websocket: WebSocket, token: str):
+    # No DB dependency: the handshake is usually served from handshake_cache
+    await websocket_endpoint(websocket, token)
 
 
 # Health check
@@ -159,6 +139,19 @@ async def health_check():
     return {"status": "healthy", "service": "maze-backend"}
 
 
+# Metrics (route DB timings, queue depths, broker counters): open with DEBUG, admins only otherwise
+@app.get("/metrics", dependencies=[] if settings.DEBUG else [Depends(get_admin_user)])
+async def get_metrics():
+    return metrics.snapshot()
+
+
+# Mount static files (frontend) after the API routes so it doesn't shadow them
+import os
+frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+if os.path.exists(frontend_path):
+    app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
+
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -169,6 +162,7 @@ async def root():
     }
 
 
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=7100)
@@ -6,6 +6,8 @@ from models.trap import Trap, TrapType
 from models.portal import Portal
 from models.character import Character
 from models.transaction import Transaction
+from models.lease import Lease
+from models.chat import ChatMessage
 
 __all__ = [
     "User",
@@ -23,4 +25,6 @@ __all__ = [
     "Portal",
     "Character",
     "Transaction",
+    "Lease",
+    "ChatMessage",
 ]
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from database import Base
+
+
+class ChatMessage(Base):
+    """Room chat history; written in batches by chat_log, purged after CHAT_RETENTION_DAYS"""
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    maze_id = Column(Integer, ForeignKey("mazes.id"), nullable=False)
+    room_x = Column(Integer, nullable=False)
+    room_y = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    username = Column(String(50), nullable=False)
+    message = Column(String(500), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    __table_args__ = (
+        Index("ix_chat_messages_room", "maze_id", "room_x", "room_y", "created_at"),
+    )
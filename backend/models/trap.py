@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -17,6 +17,12 @@ class TrapType(str, enum.Enum):
 
 class Trap(Base):
     __tablename__ = "traps"
+    __table_args__ = (
+        # Trap lookup on every move (get_active_trap_in_room)
+        Index("ix_traps_room", "maze_id", "room_x", "room_y"),
+        # Trap scheduler's poll for traps triggered since its last sync
+        Index("ix_traps_triggered_at", "triggered_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     maze_id = Column(Integer, ForeignKey("mazes.id"), nullable=False)
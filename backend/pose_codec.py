@@ -0,0 +1,87 @@
+import math
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+# Clients opt in by requesting this WebSocket sub-protocol; pose traffic then
+# uses the binary frames below while every other message stays JSON text.
+SUBPROTOCOL = "maze-pose-v1"
+
+# Frame types (first byte)
+POSE_UPDATE = 0x01  # client -> server: one full pose
+SNAPSHOT = 0x02  # server -> client: changed fields of the players that moved
+
+# Rooms are 10 units wide and 5 high, centered on the origin; the range
+# leaves room for door transitions. 16 bits over 16 units ~ 0.25 mm.
+POS_RANGE = 8.0
+POS_SCALE = 65535 / (2 * POS_RANGE)
+ANGLE_SCALE = 32768 / math.pi
+
+FIELD_COUNT = 5  # x, y, z, yaw, pitch; bit i of an entry's mask = field i present
+FULL_MASK = (1 << FIELD_COUNT) - 1
+
+_pose_update = struct.Struct("<B3H2h")
+_snapshot_header = struct.Struct("<BH")
+_entry_header = struct.Struct("<HB")
+_field_formats = "HHHhh"
+
+Pose = Tuple[int, int, int, int, int]  # quantized x, y, z, yaw, pitch
+
+
+def _quantize_position(value: float) -> int:
+    return min(65535, max(0, int(round((value + POS_RANGE) * POS_SCALE))))
+
+
+def _quantize_angle(value: float) -> int:
+    wrapped = (value + math.pi) % (2 * math.pi) - math.pi
+    return min(32767, max(-32768, int(round(wrapped * ANGLE_SCALE))))
+
+
+def quantize_pose(pos_x: float, pos_y: float, pos_z: float, yaw: float, pitch: float) -> Pose:
+    return (
+        _quantize_position(pos_x),
+        _quantize_position(pos_y),
+        _quantize_position(pos_z),
+        _quantize_angle(yaw),
+        _quantize_angle(pitch),
+    )
+
+
+def dequantize_pose(pose: Pose) -> Tuple[float, float, float, float, float]:
+    x, y, z, yaw, pitch = pose
+    return (
+        x / POS_SCALE - POS_RANGE,
+        y / POS_SCALE - POS_RANGE,
+        z / POS_SCALE - POS_RANGE,
+        yaw / ANGLE_SCALE,
+        pitch / ANGLE_SCALE,
+    )
+
+
+def decode_pose_update(frame: bytes) -> Optional[Tuple[float, float, float, float, float]]:
+    """Client pose frame -> (pos_x, pos_y, pos_z, yaw, pitch); None if malformed"""
+    if len(frame) != _pose_update.size or frame[0] != POSE_UPDATE:
+        return None
+    return dequantize_pose(_pose_update.unpack(frame)[1:])
+
+
+def changed_mask(pose: Pose, baseline: Optional[Pose]) -> int:
+    """Fields of pose that differ from what the room last received (all if no baseline)"""
+    if baseline is None:
+        return FULL_MASK
+    mask = 0
+    for i in range(FIELD_COUNT):
+        if pose[i] != baseline[i]:
+            mask |= 1 << i
+    return mask
+
+
+def encode_snapshot(entries: Iterable[Tuple[int, int, Pose]]) -> bytes:
+    """(slot, mask, pose) entries -> one snapshot frame carrying only the masked fields"""
+    parts: List[bytes] = []
+    count = 0
+    for slot, mask, pose in entries:
+        parts.append(_entry_header.pack(slot, mask))
+        fields = [i for i in range(FIELD_COUNT) if mask & (1 << i)]
+        parts.append(struct.pack("<" + "".join(_field_formats[i] for i in fields), *(pose[i] for i in fields)))
+        count += 1
+    return _snapshot_header.pack(SNAPSHOT, count) + b"".join(parts)
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import select, or_
 
 from database import get_db
+from door_grid import door_grids
 from services.maze import MazeService
 from services.room import RoomService
 from services.reward import RewardService
 from services.trap import TrapService
+from tasks.reward_scheduler import reward_scheduler
+from tasks.trap_scheduler import trap_scheduler
+from websocket_handler import manager
 from routes.auth import get_current_user
 from schemas import MazeCreate
 from models.maze import Maze
@@ -126,6 +131,7 @@ async def delete_maze(
     maze_name = maze.name
     await db.delete(maze)
     await db.commit()
+    door_grids.invalidate(maze_id)
 
     return {"success": True, "message": f"Maze '{maze_name}' deleted successfully"}
 
@@ -171,11 +177,12 @@ async def spawn_reward(
 ):
     """Manually spawn a reward"""
     reward_service = RewardService(db)
+    occupied = manager.get_occupied_rooms(maze_id)
 
     if reward_type == "big":
-        reward = await reward_service.spawn_big_reward(maze_id)
+        reward = await reward_service.spawn_big_reward(maze_id, occupied)
     elif reward_type == "small":
-        reward = await reward_service.spawn_small_reward(maze_id)
+        reward = await reward_service.spawn_small_reward(maze_id, occupied)
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -188,6 +195,8 @@ async def spawn_reward(
             detail="Could not spawn reward (no empty rooms?)"
         )
 
+    reward_scheduler.track_reward(reward)
+
     return {
         "success": True,
         "reward_id": reward.id,
@@ -216,6 +225,8 @@ async def spawn_trap(
             detail="Could not spawn trap"
         )
 
+    trap_scheduler.track_trap(trap)
+
     return {
         "success": True,
         "trap_id": trap.id,
@@ -293,7 +304,11 @@ async def get_maze_rooms(
     rewards = rewards_result.scalars().all()
 
     traps_result = await db.execute(
-        select(Trap).where(Trap.maze_id == maze_id, Trap.is_active == True)
+        select(Trap).where(
+            Trap.maze_id == maze_id,
+            Trap.is_active == True,
+            or_(Trap.expires_at == None, Trap.expires_at > datetime.utcnow())
+        )
     )
     traps = traps_result.scalars().all()
 
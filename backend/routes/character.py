@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from appearance import appearances
 from database import get_db
 from services.character import CharacterService
 from routes.auth import get_current_user
@@ -49,6 +51,19 @@ async def update_my_character(
     return character
 
 
+@router.get("/appearance/{appearance_hash}")
+async def get_appearance(appearance_hash: str):
+    """Appearance by content hash (as sent in WebSocket messages); never changes, so cacheable forever"""
+    character = appearances.get(appearance_hash)
+    if character is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Appearance not found"
+        )
+
+    return JSONResponse(character, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
 @router.get("/options")
 async def get_character_options():
     """Get all available character customization options"""
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import Optional
 
 from database import get_db
+from models.maze import Room
+from models.trap import TrapType
 from services.maze import MazeService
 from services.reward import RewardService
 from services.trap import TrapService
 from routes.auth import get_current_user
+from websocket_handler import manager
 from schemas import (
     GameStartResponse, MoveRequest, MoveResponse,
     RoomResponse, RewardResponse
@@ -165,12 +169,12 @@ async def move(
     trap_result = None
     if trap:
         # Get all rooms for random teleport
-        maze = await maze_service.get_maze(session.maze_id)
-        rooms_result = await db.execute(
-            "SELECT * FROM rooms WHERE maze_id = :maze_id",
-            {"maze_id": session.maze_id}
-        )
-        rooms = []  # Simplified, would need proper query
+        rooms = []
+        if trap.trap_type == TrapType.RANDOM_TELEPORT.value:
+            rooms_result = await db.execute(
+                select(Room).where(Room.maze_id == session.maze_id)
+            )
+            rooms = rooms_result.scalars().all()
 
         trigger_result = await trap_service.trigger_trap(trap, session, current_user, rooms)
         trap_result = trigger_result.get("effect")
@@ -182,6 +186,9 @@ async def move(
             room = await maze_service.get_room(session.maze_id, new_x, new_y)
             result["room"] = await maze_service._room_to_dict(room)
 
+    # Move the player's WebSocket presence along (room_change is validated against this)
+    await manager.set_session_room(current_user.id, session.maze_id, new_x, new_y)
+
     return MoveResponse(
         success=True,
         room=RoomResponse(**result["room"]),
@@ -314,6 +321,8 @@ async def use_portal(
     db.add(visited)
     await db.commit()
 
+    await manager.set_session_room(current_user.id, session.maze_id, new_x, new_y)
+
     # Get new room
     new_room = await maze_service.get_room(session.maze_id, new_x, new_y)
     room_data = await maze_service._room_to_dict(new_room)
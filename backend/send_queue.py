@@ -0,0 +1,141 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+from typing import Callable, Optional, Union
+from fastapi import WebSocket
+
+from config import settings
+from metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def encode(message: dict) -> str:
+    """Encode a message to a text frame once, so it can be sent to any number of clients"""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class SendQueue:
+    """Bounded outbound queue of one WebSocket, drained by its own writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        maxsize: int = None,
+        on_drop: Callable[[], None] = None,
+        on_error: Callable[[], None] = None
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize or settings.WS_SEND_QUEUE_SIZE
+        self.on_drop = on_drop  # e.g. schedule a full pose resync for this client
+        self.on_error = on_error  # a send failed - the socket is dead (e.g. hand it to the reaper)
+        # Two lanes so dropping the oldest position update is O(1); the
+        # sequence numbers keep the original order when draining
+        self._control: deque = deque()
+        self._droppable: deque = deque()
+        self._seq = itertools.count()
+        self._waiter: Optional[asyncio.Future] = None  # set while the writer is idle
+        self.full_since: Optional[float] = None
+        self.dropped = 0
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._control) + len(self._droppable)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def put(self, frame: Union[str, bytes], droppable: bool = False):
+        """Queue an encoded frame (text, or bytes for binary) without waiting on the client; droppable = position update"""
+        if self.closed:
+            return
+
+        control, droppable_lane = self._control, self._droppable
+        if len(control) + len(droppable_lane) >= self.maxsize:
+            now = asyncio.get_running_loop().time()
+            if self.full_since is None:
+                self.full_since = now
+            elif now - self.full_since > settings.WS_SEND_FULL_TIMEOUT:
+                # Full for too long - the client can't keep up
+                metrics.inc("ws.send_queue.overflow_disconnects")
+                self.close(code=1013, reason="Client too slow")
+                return
+
+            if droppable_lane:
+                # Oldest position update makes room
+                droppable_lane.popleft()
+                self._dropped()
+            elif droppable:
+                self._dropped()
+                return
+            # Control messages are kept even above the limit
+
+        (droppable_lane if droppable else control).append((next(self._seq), frame))
+
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _dropped(self):
+        self.dropped += 1
+        metrics.inc("ws.send_queue.dropped")
+        if self.on_drop is not None:
+            self.on_drop()
+
+    def _pop(self) -> Union[str, bytes]:
+        if not self._droppable or (self._control and self._control[0][0] < self._droppable[0][0]):
+            return self._control.popleft()[1]
+        return self._droppable.popleft()[1]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if not (self._control or self._droppable):
+                    self._waiter = loop.create_future()
+                    await self._waiter
+                    # Backlog found on each wake-up (sampled here, not on every put)
+                    metrics.observe("ws.send_queue.depth", len(self))
+
+                frame = self._pop()
+                if self.full_since is not None and len(self) < self.maxsize:
+                    self.full_since = None
+                if frame.__class__ is bytes:
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Connection is gone; the receive loop or the reaper cleans up
+            self.closed = True
+            metrics.inc("ws.send_queue.send_errors")
+            if self.on_error is not None:
+                self.on_error()
+
+    def close(self, code: int = None, reason: str = None):
+        """Stop the writer; with a code, also close the socket (e.g. on overflow)"""
+        if self.closed:
+            return
+        self.closed = True
+        self._control.clear()
+        self._droppable.clear()
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code, reason))
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), 5)
+        except Exception:
+            pass
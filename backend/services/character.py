@@ -4,6 +4,7 @@ from sqlalchemy import select
 
 from models.character import Character
 from models.user import User
+from handshake_cache import handshake_cache
 
 
 class CharacterService:
@@ -44,6 +45,7 @@ class CharacterService:
         self.db.add(character)
         await self.db.commit()
         await self.db.refresh(character)
+        handshake_cache.forget_character(user_id)
         return character
 
     async def update_character(
@@ -66,6 +68,8 @@ class CharacterService:
 
         await self.db.commit()
         await self.db.refresh(character)
+        # Next WebSocket connect rebuilds the appearance payload
+        handshake_cache.forget_character(character.user_id)
         return character
 
     def character_to_dict(self, character: Character) -> Dict[str, Any]:
@@ -10,6 +10,7 @@ from models.maze import Maze, Room, RoomDesign, RoomAd, RoomTemplate
 from models.game_session import GameSession, VisitedRoom, PlayerPosition
 from models.portal import Portal
 from config import settings
+from handshake_cache import handshake_cache
 
 
 class MazeService:
@@ -328,6 +329,8 @@ class MazeService:
 
         await self.db.commit()
         await self.db.refresh(session)
+        # The WebSocket handshake picks the newest active session
+        handshake_cache.forget_session(user_id)
         return session
 
     async def get_session_by_token(self, token: str) -> Optional[GameSession]:
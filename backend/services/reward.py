@@ -1,14 +1,15 @@
 import random
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AbstractSet, Tuple, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_
+from sqlalchemy.engine import Row
+from sqlalchemy.orm.attributes import set_committed_value
 
 from models.maze import Maze, Room
 from models.reward import Reward, RewardClaim, RewardType
 from models.user import User
 from models.transaction import Transaction, TransactionType
-from models.game_session import GameSession
 from config import settings
 
 
@@ -16,8 +17,12 @@ class RewardService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def spawn_big_reward(self, maze_id: int) -> Optional[Reward]:
-        """Spawn a big reward in a random empty room"""
+    async def spawn_big_reward(
+        self,
+        maze_id: int,
+        occupied_coords: AbstractSet[Tuple[int, int]] = frozenset()
+    ) -> Optional[Reward]:
+        """Spawn a big reward in a random room without players (occupied_coords)"""
         # Get all rooms
         result = await self.db.execute(
             select(Room).where(Room.maze_id == maze_id)
@@ -27,15 +32,6 @@ class RewardService:
         if not rooms:
             return None
 
-        # Get rooms with active players
-        active_sessions = await self.db.execute(
-            select(GameSession)
-            .where(and_(GameSession.maze_id == maze_id, GameSession.is_active == True))
-        )
-        occupied_coords = set()
-        for session in active_sessions.scalars().all():
-            occupied_coords.add((session.current_room_x, session.current_room_y))
-
         # Find empty rooms
         empty_rooms = [r for r in rooms if (r.x, r.y) not in occupied_coords]
         if not empty_rooms:
@@ -65,8 +61,12 @@ class RewardService:
 
         return reward
 
-    async def spawn_small_reward(self, maze_id: int) -> Optional[Reward]:
-        """Spawn a small reward in a random ad room"""
+    async def spawn_small_reward(
+        self,
+        maze_id: int,
+        occupied_coords: AbstractSet[Tuple[int, int]] = frozenset()
+    ) -> Optional[Reward]:
+        """Spawn a small reward in a random ad room without players (occupied_coords)"""
         # Get rooms with ads (sold rooms typically have ads)
         result = await self.db.execute(
             select(Room).where(and_(Room.maze_id == maze_id, Room.is_sold == True))
@@ -83,15 +83,6 @@ class RewardService:
         if not ad_rooms:
             return None
 
-        # Get rooms with active players
-        active_sessions = await self.db.execute(
-            select(GameSession)
-            .where(and_(GameSession.maze_id == maze_id, GameSession.is_active == True))
-        )
-        occupied_coords = set()
-        for session in active_sessions.scalars().all():
-            occupied_coords.add((session.current_room_x, session.current_room_y))
-
         # Find empty rooms
         empty_rooms = [r for r in ad_rooms if (r.x, r.y) not in occupied_coords]
         if not empty_rooms:
@@ -152,35 +143,55 @@ class RewardService:
         return result.scalar_one_or_none()
 
     async def claim_reward(self, reward: Reward, user: User) -> Dict[str, Any]:
-        """Claim a reward"""
+        """Claim a reward with a compare-and-set UPDATE; exactly one concurrent claimer wins"""
         now = datetime.utcnow()
 
-        # Check if reward is still valid
-        if reward.is_claimed:
-            return {"success": False, "error": "Reward already claimed"}
-        if reward.is_expired or reward.expires_at <= now:
-            reward.is_expired = True
+        # Claim only if still unclaimed and unexpired - no read-then-write window
+        result = await self.db.execute(
+            update(Reward)
+            .where(and_(
+                Reward.id == reward.id,
+                Reward.is_claimed == False,
+                Reward.is_expired == False,
+                Reward.expires_at > now
+            ))
+            .values(is_claimed=True, claimed_by_id=user.id, claimed_at=now)
+            .returning(Reward.amount, Reward.reward_type)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = result.first()
+
+        if claimed is None:
+            # Lost the race or too late; the UPDATE changed nothing, release the lock first
             await self.db.commit()
+            is_claimed = await self.db.scalar(
+                select(Reward.is_claimed).where(Reward.id == reward.id)
+            )
+            if is_claimed:
+                return {"success": False, "error": "Reward already claimed"}
             return {"success": False, "error": "Reward has expired"}
 
-        # Claim the reward
-        reward.is_claimed = True
-        reward.claimed_by_id = user.id
-        reward.claimed_at = now
+        amount, reward_type = claimed
 
-        # Add to user balance
-        user.balance += reward.amount
-        new_balance = user.balance
+        # Add to user balance in the same transaction
+        result = await self.db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(balance=User.balance + amount)
+            .returning(User.balance)
+            .execution_options(synchronize_session=False)
+        )
+        new_balance = result.scalar_one()
 
         # Create transaction
         transaction = Transaction(
             user_id=user.id,
             transaction_type=TransactionType.REWARD_CLAIM.value,
-            amount=reward.amount,
+            amount=amount,
             balance_after=new_balance,
             reference_type="reward",
             reference_id=reward.id,
-            description=f"Claimed {reward.reward_type} reward: ${reward.amount}"
+            description=f"Claimed {reward_type} reward: ${amount}"
         )
         self.db.add(transaction)
 
@@ -188,39 +199,59 @@ class RewardService:
         claim = RewardClaim(
             reward_id=reward.id,
             user_id=user.id,
-            amount=reward.amount
+            amount=amount
         )
         self.db.add(claim)
 
         await self.db.commit()
 
+        # Keep the already-loaded objects in sync with what was written
+        set_committed_value(user, "balance", new_balance)
+        set_committed_value(reward, "is_claimed", True)
+        set_committed_value(reward, "claimed_by_id", user.id)
+        set_committed_value(reward, "claimed_at", now)
+
         return {
             "success": True,
-            "amount": reward.amount,
-            "reward_type": reward.reward_type,
+            "amount": amount,
+            "reward_type": reward_type,
             "new_balance": new_balance,
-            "is_big_reward": reward.reward_type == RewardType.BIG.value
+            "is_big_reward": reward_type == RewardType.BIG.value
         }
 
-    async def expire_old_rewards(self, maze_id: int) -> int:
-        """Mark expired rewards as expired"""
-        now = datetime.utcnow()
+    async def get_pending_rewards(self) -> List[Reward]:
+        """Get unclaimed rewards not yet marked expired, across all mazes"""
         result = await self.db.execute(
             select(Reward)
             .where(and_(
-                Reward.maze_id == maze_id,
                 Reward.is_claimed == False,
-                Reward.is_expired == False,
-                Reward.expires_at <= now
+                Reward.is_expired == False
             ))
         )
-        rewards = result.scalars().all()
+        return result.scalars().all()
+
+    async def expire_old_rewards(self, maze_id: Optional[int] = None) -> Sequence[Row]:
+        """Mark overdue rewards expired with one UPDATE ... RETURNING (all mazes if maze_id is None)"""
+        now = datetime.utcnow()
+        conditions = [
+            Reward.is_claimed == False,
+            Reward.is_expired == False,
+            Reward.expires_at <= now
+        ]
+        if maze_id is not None:
+            conditions.append(Reward.maze_id == maze_id)
 
-        for reward in rewards:
-            reward.is_expired = True
+        result = await self.db.execute(
+            update(Reward)
+            .where(and_(*conditions))
+            .values(is_expired=True)
+            .returning(Reward.id, Reward.maze_id, Reward.room_x, Reward.room_y, Reward.reward_type)
+            .execution_options(synchronize_session=False)
+        )
+        expired = result.all()  # (id, maze_id, room_x, room_y, reward_type)
 
         await self.db.commit()
-        return len(rewards)
+        return expired
 
     async def should_spawn_reward(self, maze: Maze, reward_type: str) -> bool:
         """Check if a reward should spawn based on probability"""
@@ -1,19 +1,51 @@
 import random
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, insert, update, and_, or_
+from sqlalchemy.engine import Row
 
 from models.maze import Maze, Room
 from models.trap import Trap, TrapType
 from models.game_session import GameSession
 from models.user import User
+from config import settings
+from effects import effect_engine
+
+
+# Effect duration (seconds) per trap type
+TRAP_DURATIONS = {
+    TrapType.TELEPORT_START.value: 0,
+    TrapType.FREEZE.value: 180,  # 3 minutes
+    TrapType.BLIND.value: 30,  # 30 seconds
+    TrapType.SLOW.value: 60,  # 1 minute
+    TrapType.REVERSE_CONTROLS.value: 45,  # 45 seconds
+    TrapType.RANDOM_TELEPORT.value: 0,
+    TrapType.LOSE_REWARD.value: 0
+}
+
+# Share of the balance a lose_reward trap takes
+LOSE_REWARD_PENALTY = 0.1
 
 
 class TrapService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    def _expires_at(self) -> Optional[datetime]:
+        """Expiry for a trap spawned now (None if traps live until triggered)"""
+        if settings.TRAP_LIFETIME <= 0:
+            return None
+        return datetime.utcnow() + timedelta(seconds=settings.TRAP_LIFETIME)
+
+    def _is_live(self, now: datetime):
+        """Filter for traps that can still be triggered"""
+        return and_(
+            Trap.is_active == True,
+            Trap.is_triggered == False,
+            or_(Trap.expires_at == None, Trap.expires_at > now)
+        )
+
     async def spawn_trap(self, maze_id: int, trap_type: str = None) -> Optional[Trap]:
         """Spawn a trap in a random room"""
         # Get all rooms
@@ -38,24 +70,14 @@ class TrapService:
             trap_types = [t.value for t in TrapType]
             trap_type = random.choice(trap_types)
 
-        # Set duration based on trap type
-        duration_map = {
-            TrapType.TELEPORT_START.value: 0,
-            TrapType.FREEZE.value: 180,  # 3 minutes
-            TrapType.BLIND.value: 30,  # 30 seconds
-            TrapType.SLOW.value: 60,  # 1 minute
-            TrapType.REVERSE_CONTROLS.value: 45,  # 45 seconds
-            TrapType.RANDOM_TELEPORT.value: 0,
-            TrapType.LOSE_REWARD.value: 0
-        }
-
         # Create trap
         trap = Trap(
             maze_id=maze_id,
             room_x=target_room.x,
             room_y=target_room.y,
             trap_type=trap_type,
-            duration=duration_map.get(trap_type, 60)
+            duration=TRAP_DURATIONS.get(trap_type, 60),
+            expires_at=self._expires_at()
         )
         self.db.add(trap)
         await self.db.commit()
@@ -71,11 +93,10 @@ class TrapService:
                 Trap.maze_id == maze_id,
                 Trap.room_x == x,
                 Trap.room_y == y,
-                Trap.is_active == True,
-                Trap.is_triggered == False
+                self._is_live(datetime.utcnow())
             ))
         )
-        return result.scalar_one_or_none()
+        return result.scalars().first()
 
     async def trigger_trap(
         self,
@@ -135,7 +156,7 @@ class TrapService:
 
         elif trap.trap_type == TrapType.LOSE_REWARD.value:
             # Lose 10% of balance
-            penalty = user.balance * 0.1
+            penalty = user.balance * LOSE_REWARD_PENALTY
             user.balance -= penalty
             effect_result["penalty"] = penalty
             effect_result["new_balance"] = user.balance
@@ -143,23 +164,28 @@ class TrapService:
 
         await self.db.commit()
 
+        # Timed effects are tracked in memory and pushed to the player's WebSocket
+        params = {}
+        if "speed_multiplier" in effect_result:
+            params["speed_multiplier"] = effect_result["speed_multiplier"]
+        await effect_engine.start(session.id, user.id, trap.trap_type, trap.duration, params)
+
         return {
             "success": True,
             "effect": effect_result
         }
 
     async def check_freeze_status(self, session: GameSession) -> bool:
-        """Check if player is still frozen"""
-        if not session.is_frozen:
-            return False
-
-        if session.frozen_until and session.frozen_until <= datetime.utcnow():
-            session.is_frozen = False
-            session.frozen_until = None
-            await self.db.commit()
-            return False
+        """Check if player is still frozen (read-only; the effect engine persists the thaw)"""
+        if effect_engine.has_effect(session.id, TrapType.FREEZE.value):
+            return True
 
-        return True
+        # Frozen on another worker, or before a restart
+        return bool(
+            session.is_frozen
+            and session.frozen_until
+            and session.frozen_until > datetime.utcnow()
+        )
 
     async def get_all_traps(self, maze_id: int) -> List[Trap]:
         """Get all active traps in a maze"""
@@ -167,8 +193,66 @@ class TrapService:
             select(Trap)
             .where(and_(
                 Trap.maze_id == maze_id,
-                Trap.is_active == True,
-                Trap.is_triggered == False
+                self._is_live(datetime.utcnow())
             ))
         )
         return result.scalars().all()
+
+    async def spawn_traps(self, placements: List[Tuple[int, int, int]]) -> Sequence[Row]:
+        """Spawn random traps at (maze_id, x, y) placements with one multi-row INSERT"""
+        trap_types = [t.value for t in TrapType]
+        expires_at = self._expires_at()
+        rows = []
+        for maze_id, x, y in placements:
+            trap_type = random.choice(trap_types)
+            rows.append({
+                "maze_id": maze_id,
+                "room_x": x,
+                "room_y": y,
+                "trap_type": trap_type,
+                "duration": TRAP_DURATIONS.get(trap_type, 60),
+                "expires_at": expires_at
+            })
+
+        result = await self.db.execute(
+            insert(Trap).returning(Trap.id, Trap.maze_id, Trap.room_x, Trap.room_y, Trap.expires_at),
+            rows
+        )
+        spawned = result.all()  # (id, maze_id, room_x, room_y, expires_at)
+
+        await self.db.commit()
+        return spawned
+
+    async def get_live_traps(self) -> Sequence[Row]:
+        """(id, maze_id, room_x, room_y, expires_at) of every live trap, across all mazes"""
+        result = await self.db.execute(
+            select(Trap.id, Trap.maze_id, Trap.room_x, Trap.room_y, Trap.expires_at)
+            .where(self._is_live(datetime.utcnow()))
+        )
+        return result.all()
+
+    async def get_triggered_since(self, since: datetime) -> Sequence[Row]:
+        """(id, maze_id, room_x, room_y, triggered_at) of traps triggered after `since`"""
+        result = await self.db.execute(
+            select(Trap.id, Trap.maze_id, Trap.room_x, Trap.room_y, Trap.triggered_at)
+            .where(Trap.triggered_at > since)
+        )
+        return result.all()
+
+    async def expire_old_traps(self) -> Sequence[Row]:
+        """Deactivate overdue untriggered traps with one UPDATE ... RETURNING"""
+        result = await self.db.execute(
+            update(Trap)
+            .where(and_(
+                Trap.is_active == True,
+                Trap.is_triggered == False,
+                Trap.expires_at <= datetime.utcnow()
+            ))
+            .values(is_active=False)
+            .returning(Trap.id, Trap.maze_id, Trap.room_x, Trap.room_y)
+            .execution_options(synchronize_session=False)
+        )
+        expired = result.all()  # (id, maze_id, room_x, room_y)
+
+        await self.db.commit()
+        return expired
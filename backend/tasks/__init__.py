@@ -0,0 +1,12 @@
+from tasks.reward_scheduler import RewardScheduler, reward_scheduler
+from tasks.trap_scheduler import TrapScheduler, trap_scheduler
+from tasks.leader import LeaderElector, leader_elector
+
+__all__ = [
+    "RewardScheduler",
+    "reward_scheduler",
+    "TrapScheduler",
+    "trap_scheduler",
+    "LeaderElector",
+    "leader_elector",
+]
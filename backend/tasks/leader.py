@@ -0,0 +1,111 @@
+import asyncio
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+from sqlalchemy import update, or_
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import async_session
+from metrics import metrics
+from models.lease import Lease
+
+
+class LeaderElector:
+    """Lease-based leader election; only the lease holder runs singleton jobs"""
+
+    def __init__(self, name: str = "background-jobs"):
+        self.name = name
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self.is_leader = False
+        self._jobs: List[Callable[[], Awaitable]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, job: Callable[[], Awaitable]):
+        """Register a coroutine function to run only while this worker leads (once, however often it is added)"""
+        if job not in self._jobs:
+            self._jobs.append(job)
+
+    async def _try_acquire(self) -> bool:
+        """Take or renew the lease; succeeds if we hold it or it has lapsed"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=settings.LEADER_LEASE_TTL)
+
+        async with async_session() as db:
+            result = await db.execute(
+                update(Lease)
+                .where(
+                    Lease.name == self.name,
+                    or_(Lease.holder == self.holder_id, Lease.expires_at < now)
+                )
+                .values(holder=self.holder_id, expires_at=expires_at)
+            )
+            if result.rowcount:
+                await db.commit()
+                return True
+
+            # No row yet (first start) - race the other workers to insert it
+            db.add(Lease(name=self.name, holder=self.holder_id, expires_at=expires_at))
+            try:
+                await db.commit()
+                return True
+            except IntegrityError:
+                await db.rollback()
+                return False
+
+    async def _release(self):
+        """Expire our lease immediately so another worker takes over without waiting"""
+        async with async_session() as db:
+            await db.execute(
+                update(Lease)
+                .where(Lease.name == self.name, Lease.holder == self.holder_id)
+                .values(expires_at=datetime.utcnow())
+            )
+            await db.commit()
+
+    def _start_jobs(self):
+        print(f"Leader election: {self.holder_id} is now the leader")
+        self.is_leader = True
+        self._tasks = [asyncio.create_task(job()) for job in self._jobs]
+
+    async def _stop_jobs(self):
+        self.is_leader = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run(self):
+        """Background task: keep renewing (or trying to take) the lease"""
+        try:
+            while True:
+                try:
+                    acquired = await self._try_acquire()
+                except Exception as e:
+                    # Can't prove we still hold the lease; step down rather than risk two leaders
+                    print(f"Leader election error: {e}")
+                    acquired = False
+
+                if acquired and not self.is_leader:
+                    self._start_jobs()
+                    metrics.inc("leader.elections_won")
+                elif not acquired and self.is_leader:
+                    print(f"Leader election: {self.holder_id} lost leadership")
+                    await self._stop_jobs()
+                    metrics.inc("leader.leadership_lost")
+                metrics.set_gauge("leader.is_leader", int(self.is_leader))
+
+                await asyncio.sleep(settings.LEADER_LEASE_RENEW_INTERVAL)
+        finally:
+            if self.is_leader:
+                await self._stop_jobs()
+                try:
+                    await self._release()
+                except Exception as e:
+                    print(f"Leader election release error: {e}")
+
+
+# Global leader elector
+leader_elector = LeaderElector()
@@ -0,0 +1,287 @@
+import asyncio
+import math
+import random
+from datetime import datetime
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy import select
+
+from config import settings
+from database import async_session
+from metrics import metrics
+from models.maze import Maze
+from models.reward import Reward, RewardType
+from services.reward import RewardService
+from timers import DeadlineHeap
+from websocket_handler import manager
+
+
+class MazeSpawnState:
+    """Spawn rates of an active maze; generation invalidates stale spawn timers"""
+
+    __slots__ = ("big_chance", "small_chance", "generation")
+
+    def __init__(self, big_chance: float, small_chance: float, generation: int):
+        self.big_chance = big_chance
+        self.small_chance = small_chance
+        self.generation = generation
+
+
+class RewardScheduler:
+    """Spawns and expires rewards at exact deadlines instead of polling every maze"""
+
+    def __init__(self):
+        self.timers = DeadlineHeap()
+        self.mazes: Dict[int, MazeSpawnState] = {}
+        self._generation = 0
+        self._loaded = False
+        self._refresh_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(settings.REWARD_SCHEDULER_CONCURRENCY)
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        self._expiry_task: Optional[asyncio.Task] = None
+        self._running = False
+
+    def _loop_deadline(self, when: datetime) -> float:
+        """Convert a UTC timestamp to an event loop deadline"""
+        loop = asyncio.get_running_loop()
+        return loop.time() + (when - datetime.utcnow()).total_seconds()
+
+    def track_reward(self, reward: Reward):
+        """Schedule expiry of a reward spawned outside the scheduler (e.g. admin), from any worker"""
+        if self._running:
+            self._track_expiry(reward.id, reward.maze_id, reward.expires_at)
+        else:
+            # Only the leader runs the scheduler
+            manager.send_to_leader("reward", {
+                "id": reward.id,
+                "maze_id": reward.maze_id,
+                "expires_at": reward.expires_at.isoformat()
+            })
+
+    def _track_sent(self, item: dict):
+        self._track_expiry(item["id"], item["maze_id"], datetime.fromisoformat(item["expires_at"]))
+
+    def _track_expiry(self, reward_id: int, maze_id: int, expires_at: datetime):
+        # Small margin so the UPDATE's expires_at <= now already holds when the timer fires
+        self.timers.push(self._loop_deadline(expires_at) + 0.05, ("expire", maze_id, reward_id))
+        self._wakeup.set()
+
+    def _schedule_spawn(self, maze_id: int, reward_type: str, now: float):
+        """Draw the next spawn time from the maze's per-interval chance"""
+        state = self.mazes.get(maze_id)
+        if state is None:
+            return
+
+        chance = state.big_chance if reward_type == RewardType.BIG.value else state.small_chance
+        if not chance or chance <= 0:
+            return
+
+        if chance >= 1:
+            delay = settings.REWARD_SPAWN_INTERVAL
+        else:
+            # P(at least one spawn per interval) == chance  =>  Poisson rate
+            rate = -math.log(1 - chance) / settings.REWARD_SPAWN_INTERVAL
+            delay = random.expovariate(rate)
+
+        self.timers.push(now + delay, ("spawn", maze_id, reward_type, state.generation))
+
+    async def _refresh_mazes(self, db, now: float):
+        """Reload active mazes; (re)schedule spawns for new or retuned ones"""
+        result = await db.execute(select(Maze).where(Maze.is_active == True))
+        active = {maze.id: maze for maze in result.scalars().all()}
+
+        for maze_id in list(self.mazes):
+            if maze_id not in active:
+                del self.mazes[maze_id]
+
+        for maze_id, maze in active.items():
+            state = self.mazes.get(maze_id)
+            if (state and state.big_chance == maze.big_reward_chance
+                    and state.small_chance == maze.small_reward_chance):
+                continue
+
+            self._generation += 1
+            self.mazes[maze_id] = MazeSpawnState(
+                maze.big_reward_chance,
+                maze.small_reward_chance,
+                self._generation
+            )
+            self._schedule_spawn(maze_id, RewardType.BIG.value, now)
+            self._schedule_spawn(maze_id, RewardType.SMALL.value, now)
+
+        self._refresh_at = now + settings.REWARD_MAZE_REFRESH_INTERVAL
+
+    async def _expire_due(self):
+        """Expire every overdue reward (all mazes) with a single statement, then notify"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            async with async_session() as db:
+                expired = await RewardService(db).expire_old_rewards()
+
+            metrics.inc("reward_scheduler.rewards_expired", len(expired))
+            for reward_id, maze_id, room_x, room_y, reward_type in expired:
+                await manager.notify_reward_expired(maze_id, room_x, room_y, reward_type)
+        except Exception as e:
+            metrics.inc("reward_scheduler.expiry_errors")
+            print(f"Reward scheduler expiry error: {e}")
+            self._retry_expiry()
+        finally:
+            metrics.observe("reward_scheduler.expiry_duration_s", loop.time() - started)
+            self._expiry_task = None
+
+    async def _spawn(self, db, maze_id: int, reward_type: str):
+        reward_service = RewardService(db)
+        occupied = manager.get_occupied_rooms(maze_id)
+        if reward_type == RewardType.BIG.value:
+            reward = await reward_service.spawn_big_reward(maze_id, occupied)
+        else:
+            reward = await reward_service.spawn_small_reward(maze_id, occupied)
+
+        if reward:
+            self.track_reward(reward)
+            await manager.notify_reward_spawn(
+                maze_id,
+                reward.room_x,
+                reward.room_y,
+                reward.reward_type,
+                reward.amount,
+                reward.expires_at
+            )
+
+    async def _process_maze(self, maze_id: int, spawns: List[str]):
+        """One maze's due spawns, on its own short-lived session"""
+        async with async_session() as db:
+            for reward_type in spawns:
+                await self._spawn(db, maze_id, reward_type)
+
+    async def _run_maze(self, maze_id: int, spawns: List[str]):
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            started = loop.time()
+            try:
+                await asyncio.wait_for(
+                    self._process_maze(maze_id, spawns),
+                    settings.REWARD_MAZE_TIME_BUDGET
+                )
+            except asyncio.TimeoutError:
+                metrics.inc("reward_scheduler.maze_timeouts")
+                print(f"Reward scheduler: maze {maze_id} exceeded its time budget")
+            except Exception as e:
+                metrics.inc("reward_scheduler.maze_errors")
+                print(f"Reward scheduler error (maze {maze_id}): {e}")
+            finally:
+                metrics.observe("reward_scheduler.maze_duration_s", loop.time() - started)
+                self._in_flight.pop(maze_id, None)
+
+    def _retry_expiry(self):
+        # The expiry statement sweeps every overdue reward, so one timer is enough
+        loop = asyncio.get_running_loop()
+        self.timers.push(loop.time() + 1.0, ("expire", None, None))
+
+    def _dispatch(self, due: List[tuple], now: float):
+        """Start one expiry sweep plus per-maze spawn tasks (bounded by the semaphore)"""
+        expire = False
+        spawns: Dict[int, List[str]] = defaultdict(list)
+
+        for deadline, event in due:
+            lateness = now - deadline
+            if lateness > settings.REWARD_LATE_THRESHOLD:
+                metrics.inc("reward_scheduler.late_events")
+            metrics.observe("reward_scheduler.lateness_s", lateness)
+
+            if event[0] == "expire":
+                expire = True
+            else:
+                _, maze_id, reward_type, generation = event
+                state = self.mazes.get(maze_id)
+                if state and state.generation == generation:
+                    # Keep the spawn process going even if this pass fails or is skipped
+                    self._schedule_spawn(maze_id, reward_type, now)
+                    spawns[maze_id].append(reward_type)
+
+        if expire:
+            if self._expiry_task is None:
+                self._expiry_task = asyncio.create_task(self._expire_due())
+            else:
+                metrics.inc("reward_scheduler.skipped_ticks")
+                self._retry_expiry()
+
+        for maze_id, reward_types in spawns.items():
+            if maze_id in self._in_flight:
+                # Previous pass for this maze is still running; don't pile up behind it
+                metrics.inc("reward_scheduler.skipped_ticks")
+                continue
+
+            self._in_flight[maze_id] = asyncio.create_task(self._run_maze(maze_id, reward_types))
+
+        metrics.set_gauge("reward_scheduler.in_flight", len(self._in_flight))
+        metrics.set_gauge("reward_scheduler.timers", len(self.timers))
+
+    async def _load(self, now: float):
+        """(Re)build state: active mazes plus expiry timers for pending rewards"""
+        # Dropping the maze states invalidates any spawn timers still queued
+        self.mazes.clear()
+        async with async_session() as db:
+            await self._refresh_mazes(db, now)
+            for reward in await RewardService(db).get_pending_rewards():
+                self.track_reward(reward)
+        self._loaded = True
+
+    async def run(self):
+        """Background task: sleep until the next deadline, then handle what is due"""
+        # May be restarted (e.g. on regaining leadership) - start from a clean slate
+        self.timers = DeadlineHeap()
+        self.mazes.clear()
+        self._loaded = False
+        self._refresh_at = 0.0
+        self._running = True
+        manager.leader_handlers["reward"] = self._track_sent
+        try:
+            await self._run_loop()
+        finally:
+            self._running = False
+            manager.leader_handlers.pop("reward", None)
+            for task in self._in_flight.values():
+                task.cancel()
+            if self._expiry_task:
+                self._expiry_task.cancel()
+            self._in_flight.clear()
+            self._expiry_task = None
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            now = loop.time()
+            try:
+                if now >= self._refresh_at:
+                    if self._loaded:
+                        async with async_session() as db:
+                            await self._refresh_mazes(db, now)
+                    else:
+                        await self._load(now)
+
+                due = self.timers.pop_due(now) if self._loaded else []
+                if due:
+                    self._dispatch(due, now)
+            except Exception as e:
+                print(f"Reward scheduler error: {e}")
+                # Rebuild everything shortly
+                self._loaded = False
+                self._refresh_at = now + settings.REWARD_SPAWN_INTERVAL
+
+            next_deadline = self._refresh_at
+            if self._loaded and len(self.timers):
+                next_deadline = min(next_deadline, self.timers.next_deadline())
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_deadline - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global reward scheduler
+reward_scheduler = RewardScheduler()
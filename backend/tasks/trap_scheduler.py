@@ -0,0 +1,223 @@
+import asyncio
+import random
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import select
+
+from config import settings
+from database import async_session
+from metrics import metrics
+from models.maze import Maze
+from models.trap import Trap
+from services.trap import TrapService
+from timers import DeadlineHeap
+from websocket_handler import manager
+
+
+class TrapScheduler:
+    """Keeps every active maze at TRAP_DENSITY live traps and expires them at their deadlines.
+
+    The trap index (self.traps) is the leader's bookkeeping for refills and expiry;
+    the move route looks traps up in the database (ix_traps_room), on any worker.
+    """
+
+    def __init__(self):
+        self.timers = DeadlineHeap()
+        self.mazes: Dict[int, Tuple[int, int]] = {}  # maze_id -> (width, height)
+        self.traps: Dict[int, Dict[Tuple[int, int], int]] = {}  # maze_id -> {(x, y): trap_id}
+        self._dirty: Set[int] = set()  # mazes that may be below their target
+        self._triggered_since = datetime.utcnow()
+        self._loaded = False
+        self._sync_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._running = False
+
+    def _loop_deadline(self, when: datetime) -> float:
+        """Convert a UTC timestamp to an event loop deadline"""
+        loop = asyncio.get_running_loop()
+        return loop.time() + (when - datetime.utcnow()).total_seconds()
+
+    def target_count(self, maze_id: int) -> int:
+        width, height = self.mazes[maze_id]
+        # The starting room never holds a trap
+        return int(round(settings.TRAP_DENSITY * (width * height - 1)))
+
+    def _add(self, trap_id: int, maze_id: int, x: int, y: int, expires_at: Optional[datetime]):
+        self.traps.setdefault(maze_id, {})[(x, y)] = trap_id
+        if expires_at is not None:
+            # Small margin so the UPDATE's expires_at <= now already holds when the timer fires
+            self.timers.push(self._loop_deadline(expires_at) + 0.05, trap_id)
+
+    def _remove(self, trap_id: int, maze_id: int, x: int, y: int):
+        index = self.traps.get(maze_id)
+        if index and index.get((x, y)) == trap_id:
+            del index[(x, y)]
+            self._dirty.add(maze_id)
+
+    def track_trap(self, trap: Trap):
+        """Index a trap spawned outside the scheduler (e.g. admin), from any worker"""
+        if self._running:
+            self._add(trap.id, trap.maze_id, trap.room_x, trap.room_y, trap.expires_at)
+            self._wakeup.set()
+        else:
+            # Only the leader runs the scheduler
+            manager.send_to_leader("trap", {
+                "id": trap.id,
+                "maze_id": trap.maze_id,
+                "room_x": trap.room_x,
+                "room_y": trap.room_y,
+                "expires_at": trap.expires_at.isoformat() if trap.expires_at else None
+            })
+
+    def _track_sent(self, item: dict):
+        expires_at = item["expires_at"]
+        self._add(
+            item["id"], item["maze_id"], item["room_x"], item["room_y"],
+            datetime.fromisoformat(expires_at) if expires_at else None
+        )
+        self._wakeup.set()
+
+    def _pick_rooms(self, maze_id: int, count: int) -> List[Tuple[int, int]]:
+        """Random trap-free rooms (never the starting room); O(count) while the maze is sparse"""
+        width, height = self.mazes[maze_id]
+        taken = self.traps.get(maze_id, {})
+        free_count = width * height - 1 - len(taken)
+        count = min(count, free_count)
+        if count <= 0:
+            return []
+
+        if count * 2 > free_count:
+            free = [
+                (x, y) for y in range(height) for x in range(width)
+                if (x, y) != (0, 0) and (x, y) not in taken
+            ]
+            return random.sample(free, count)
+
+        picked = set()
+        while len(picked) < count:
+            room = (random.randrange(width), random.randrange(height))
+            if room != (0, 0) and room not in taken:
+                picked.add(room)
+        return list(picked)
+
+    async def _refresh_mazes(self, db):
+        result = await db.execute(
+            select(Maze.id, Maze.width, Maze.height).where(Maze.is_active == True)
+        )
+        active = {maze_id: (width, height) for maze_id, width, height in result.all()}
+
+        for maze_id in list(self.mazes):
+            if maze_id not in active:
+                del self.mazes[maze_id]
+                self.traps.pop(maze_id, None)
+                self._dirty.discard(maze_id)
+
+        for maze_id, size in active.items():
+            if self.mazes.get(maze_id) != size:
+                self.mazes[maze_id] = size
+                self._dirty.add(maze_id)
+
+    async def _load(self, db, now: float):
+        """(Re)build the trap index from the database"""
+        self.timers = DeadlineHeap()
+        self.traps.clear()
+        self._dirty.clear()
+        self._triggered_since = datetime.utcnow()
+
+        await self._refresh_mazes(db)
+        for trap_id, maze_id, x, y, expires_at in await TrapService(db).get_live_traps():
+            if maze_id in self.mazes:
+                self._add(trap_id, maze_id, x, y, expires_at)
+
+        self._dirty.update(self.mazes)
+        self.timers.push(now, None)  # sweep traps that lapsed while nobody was leading
+        self._loaded = True
+        self._sync_at = now + settings.TRAP_SYNC_INTERVAL
+
+    async def _sync(self, db, now: float):
+        """Pick up maze changes and traps triggered since the last pass (changes only)"""
+        await self._refresh_mazes(db)
+
+        triggered = await TrapService(db).get_triggered_since(self._triggered_since)
+        for trap_id, maze_id, x, y, triggered_at in triggered:
+            self._remove(trap_id, maze_id, x, y)
+            self._triggered_since = max(self._triggered_since, triggered_at)
+        metrics.inc("trap_scheduler.traps_triggered", len(triggered))
+
+        self._sync_at = now + settings.TRAP_SYNC_INTERVAL
+
+    async def _expire_due(self, db):
+        expired = await TrapService(db).expire_old_traps()
+        for trap_id, maze_id, x, y in expired:
+            self._remove(trap_id, maze_id, x, y)
+        metrics.inc("trap_scheduler.traps_expired", len(expired))
+
+    async def _refill(self, db):
+        """Top dirty mazes up to their target with one multi-row INSERT"""
+        placements = []
+        for maze_id in self._dirty:
+            if maze_id not in self.mazes:
+                continue
+            missing = self.target_count(maze_id) - len(self.traps.get(maze_id, {}))
+            placements.extend((maze_id, x, y) for x, y in self._pick_rooms(maze_id, missing))
+        self._dirty.clear()
+
+        if placements:
+            for trap_id, maze_id, x, y, expires_at in await TrapService(db).spawn_traps(placements):
+                self._add(trap_id, maze_id, x, y, expires_at)
+            metrics.inc("trap_scheduler.traps_spawned", len(placements))
+
+    async def run(self):
+        """Background task: sleep until the next expiry or sync, then apply the changes"""
+        # May be restarted (e.g. on regaining leadership) - start from a clean slate
+        self.mazes.clear()
+        self._loaded = False
+        self._sync_at = 0.0
+        self._running = True
+        manager.leader_handlers["trap"] = self._track_sent
+        try:
+            await self._run_loop()
+        finally:
+            self._running = False
+            manager.leader_handlers.pop("trap", None)
+
+    async def _run_loop(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            now = loop.time()
+            try:
+                async with async_session() as db:
+                    if now >= self._sync_at:
+                        if self._loaded:
+                            await self._sync(db, now)
+                        else:
+                            await self._load(db, now)
+
+                    if self._loaded and self.timers.pop_due(now):
+                        await self._expire_due(db)
+
+                    if self._dirty and settings.TRAP_DENSITY > 0:
+                        await self._refill(db)
+            except Exception as e:
+                metrics.inc("trap_scheduler.errors")
+                print(f"Trap scheduler error: {e}")
+                # Rebuild everything shortly
+                self._loaded = False
+                self._sync_at = now + settings.TRAP_SYNC_INTERVAL
+
+            metrics.set_gauge("trap_scheduler.timers", len(self.timers))
+
+            next_deadline = self._sync_at
+            if self._loaded and len(self.timers):
+                next_deadline = min(next_deadline, self.timers.next_deadline())
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_deadline - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global trap scheduler
+trap_scheduler = TrapScheduler()
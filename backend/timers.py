@@ -0,0 +1,79 @@
+import heapq
+import itertools
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class DeadlineHeap:
+    """Min-heap of (deadline, item); push/pop are O(log n), peek is O(1)"""
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()  # tie-breaker so items never get compared
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, deadline: float, item: Any):
+        heapq.heappush(self._heap, (deadline, next(self._seq), item))
+
+    def next_deadline(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[tuple]:
+        """Pop every (deadline, item) whose deadline is <= now, earliest first"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, item = heapq.heappop(self._heap)
+            due.append((deadline, item))
+        return due
+
+
+class TimingWheel:
+    """Hashed timing wheel keyed by item; schedule/cancel are O(1), advancing costs O(slots visited)"""
+
+    def __init__(self, tick: float, slots: int = 512, now: Optional[float] = None):
+        self.tick = tick
+        self._slots: List[Dict[Hashable, tuple]] = [{} for _ in range(slots)]
+        self._where: Dict[Hashable, int] = {}  # key -> slot index
+        # Last fully elapsed tick; the current tick's slot is revisited until it has passed
+        self._current = int((time.monotonic() if now is None else now) // tick) - 1
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def schedule(self, key: Hashable, deadline: float, item: Any):
+        """Schedule (or reschedule) key at a monotonic deadline"""
+        self.cancel(key)
+        # Deadlines already behind the wheel go in the next slot it visits
+        tick = max(int(deadline // self.tick), self._current + 1)
+        slot = tick % len(self._slots)
+        self._slots[slot][key] = (deadline, item)
+        self._where[key] = slot
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def advance(self, now: float) -> List[tuple]:
+        """Pop every (key, item) whose deadline is <= now"""
+        tick = int(now // self.tick)
+        due = []
+        # One full turn visits every slot; entries for later turns stay put
+        for t in range(max(self._current + 1, tick - len(self._slots) + 1), tick + 1):
+            bucket = self._slots[t % len(self._slots)]
+            if not bucket:
+                continue
+            for key, (deadline, item) in list(bucket.items()):
+                if deadline <= now:
+                    del bucket[key]
+                    del self._where[key]
+                    due.append((key, item))
+        self._current = max(self._current, tick - 1)
+        return due
@@ -1,30 +1,446 @@
-import json
 import asyncio
+import itertools
+import json
+import math
+import time
 from datetime import datetime
-from typing import Dict, Set, Optional
+from typing import Callable, Dict, Iterable, List, Set, Optional, Tuple, AbstractSet
 from fastapi import WebSocket, WebSocketDisconnect
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql import func
 
 from models.game_session import GameSession, PlayerPosition
-from models.user import User
 from models.character import Character
 from services.auth import AuthService
+from services.character import CharacterService
+from database import async_session
+from config import settings
+from metrics import metrics
+from send_queue import SendQueue, encode
+from broker import Broker, LocalBroker, create_broker
+from door_grid import door_grids
+from appearance import appearances
+from timers import TimingWheel
+from chat_log import chat_log
+from handshake_cache import handshake_cache, ActiveSession, Principal, MISSING
+import db_stats
+import pose_codec
+
+
+# (maze_id, room_x, room_y)
+RoomKey = Tuple[int, int, int]
+
+
+# PlayerPosition columns written by the position flush (besides session_id)
+POSITION_COLUMNS = ("room_x", "room_y", "pos_x", "pos_y", "pos_z", "yaw", "pitch")
+
+
+class Player:
+    """A player as this process sees it: room, pose and appearance"""
+
+    __slots__ = (
+        "user_id", "username", "maze_id", "room_x", "room_y",
+        "pos_x", "pos_y", "pos_z", "yaw", "pitch", "character", "appearance", "slot",
+        "pose_sent", "pose_sent_near",
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        username: str,
+        maze_id: int,
+        room_x: int,
+        room_y: int,
+        character: Optional[dict],
+        slot: int
+    ):
+        self.user_id = user_id
+        self.username = username
+        self.maze_id = maze_id
+        self.room_x = room_x
+        self.room_y = room_y
+        self.pos_x = 0
+        self.pos_y = 1.6
+        self.pos_z = 0
+        self.yaw = 0
+        self.pitch = 0
+        self.character = character
+        self.appearance = appearances.register(character)  # content hash clients cache the character by
+        self.slot = slot  # small id used instead of user_id in binary pose frames (per process)
+        self.pose_sent: Optional[pose_codec.Pose] = None  # quantized pose the room last received (delta baseline)
+        self.pose_sent_near: Optional[pose_codec.Pose] = None  # same for the neighbour rooms' watchers
+
+    @property
+    def room_key(self) -> RoomKey:
+        return (self.maze_id, self.room_x, self.room_y)
+
+
+class Connection(Player):
+    """A player connected to this process"""
+
+    __slots__ = (
+        "websocket", "session_id", "queue", "binary", "watching", "session_room",
+        "tokens", "tokens_at", "pending_pose", "rate_hint", "last_seen", "pinged", "known_appearances",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        username: str,
+        session_id: int,
+        maze_id: int,
+        room_x: int,
+        room_y: int,
+        character: Optional[dict],
+        queue: SendQueue,
+        slot: int,
+        binary: bool
+    ):
+        super().__init__(user_id, username, maze_id, room_x, room_y, character, slot)
+        self.websocket = websocket
+        self.session_id = session_id
+        self.queue = queue
+        self.binary = binary  # negotiated the binary pose sub-protocol
+        self.watching: Dict[RoomKey, Tuple[int, int]] = {}  # neighbour room -> (room_x, room_y)
+        self.session_room: RoomKey = (maze_id, room_x, room_y)  # where the HTTP routes last put the player
+        # Inbound pose token bucket; over-budget poses wait in pending_pose (newest wins) for the next tick
+        self.tokens = float(settings.WS_POSE_BURST)
+        self.tokens_at = time.monotonic()
+        self.pending_pose: Optional[Tuple[float, float, float, float, float]] = None
+        self.rate_hint = settings.WS_POSE_INTERVAL_MS  # send interval the client was last told to use
+        self.last_seen = time.monotonic()  # last frame received (any type)
+        self.pinged = False  # a heartbeat ping is waiting for an answer
+        self.known_appearances: Set[str] = set()  # appearance hashes this client has been sent
+
+
+class RemotePlayer(Player):
+    """A player connected to another process, mirrored from its broker presence events"""
+
+    __slots__ = ("origin",)
+
+    def __init__(self, origin: str, *args):
+        super().__init__(*args)
+        self.origin = origin
 
 
 class ConnectionManager:
     """Manages WebSocket connections for multiplayer"""
 
     def __init__(self):
-        # room_key -> set of (websocket, user_id, session_id)
-        self.room_connections: Dict[str, Set[tuple]] = {}
-        # user_id -> websocket
-        self.user_connections: Dict[int, WebSocket] = {}
-        # websocket -> user data
-        self.connection_data: Dict[WebSocket, dict] = {}
+        # Other processes' rooms reach us (and ours reach them) through the broker
+        self.broker: Broker = LocalBroker()
+        # websocket -> connection
+        self.connections: Dict[WebSocket, Connection] = {}
+        # room_key -> connections in the room
+        self.room_connections: Dict[RoomKey, Set[Connection]] = {}
+        # maze_id -> {(room_x, room_y): the same sets} (occupied rooms only)
+        self.maze_rooms: Dict[int, Dict[Tuple[int, int], Set[Connection]]] = {}
+        # maze_id -> connections in the maze
+        self.maze_connections: Dict[int, Set[Connection]] = {}
+        # user_id -> connection
+        self.user_connections: Dict[int, Connection] = {}
+        # Players connected to other processes: user_id -> player, and the same two room indexes
+        self.remote_players: Dict[int, RemotePlayer] = {}
+        self.remote_members: Dict[RoomKey, Set[RemotePlayer]] = {}
+        self.remote_rooms: Dict[int, Dict[Tuple[int, int], Set[RemotePlayer]]] = {}
+        # room_key -> players (local or remote) whose pose changed since the last snapshot tick
+        self.dirty_poses: Dict[RoomKey, Set[Player]] = {}
+        # room_key -> connections in door-connected rooms that see into it (area of interest)
+        self.room_watchers: Dict[RoomKey, Set[Connection]] = {}
+        # room_key -> players whose pose changed since the last neighbour tick (watched rooms only)
+        self.near_dirty: Dict[RoomKey, Set[Player]] = {}
+        self._tick = 0
+        # connections that lost a snapshot and get every pose they see next tick
+        self.resync: Set[Connection] = set()
+        # connections with an over-budget pose waiting for the next tick
+        self.pending_poses: Set[Connection] = set()
+        # Event loop lag (EWMA, seconds) seen by the snapshot task; feeds rate_hint
+        self.loop_lag = 0.0
+        # connection -> next heartbeat check; rescheduled lazily, so receiving a frame costs no wheel work
+        self.heartbeats = TimingWheel(settings.WS_HEARTBEAT_TICK)
+        # connections whose pose or room changed since the last PlayerPosition flush (kept after disconnect)
+        self.unsaved_positions: Set[Connection] = set()
+        # connection -> consecutive failed flushes of its row (dropped at WS_POSITION_FLUSH_ATTEMPTS)
+        self.position_failures: Dict[Connection, int] = {}
+        # what -> handler for work only the elected leader does (registered by the running schedulers)
+        self.leader_handlers: Dict[str, Callable[[dict], None]] = {}
+        self._free_slots: List[int] = []
+        self._next_slot = 1
+
+    def _take_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        slot = self._next_slot
+        self._next_slot += 1
+        return slot
+
+    def _room_key(self, maze_id: int, room_x: int, room_y: int) -> RoomKey:
+        return (maze_id, room_x, room_y)
+
+    def _join_room(self, player: Player, room_index: Dict[RoomKey, set] = None, maze_index: Dict[int, dict] = None):
+        """Add to the room indexes (local connections by default)"""
+        room_index = self.room_connections if room_index is None else room_index
+        maze_index = self.maze_rooms if maze_index is None else maze_index
+        room_key = player.room_key
+        members = room_index.get(room_key)
+        if members is None:
+            members = room_index[room_key] = set()
+            maze_index.setdefault(player.maze_id, {})[(player.room_x, player.room_y)] = members
+        members.add(player)
+
+    def _leave_room(self, player: Player, room_index: Dict[RoomKey, set] = None, maze_index: Dict[int, dict] = None):
+        room_index = self.room_connections if room_index is None else room_index
+        maze_index = self.maze_rooms if maze_index is None else maze_index
+        room_key = player.room_key
+        members = room_index.get(room_key)
+        if members is None:
+            return
+
+        members.discard(player)
+        if not members:
+            del room_index[room_key]
+            rooms = maze_index[player.maze_id]
+            del rooms[(player.room_x, player.room_y)]
+            if not rooms:
+                del maze_index[player.maze_id]
+
+    def _members(self, room_key: RoomKey) -> Iterable[Player]:
+        """Everyone in a room, whichever process they are connected to"""
+        return itertools.chain(self.room_connections.get(room_key, ()), self.remote_members.get(room_key, ()))
+
+    def _joined_message(self, player: Player) -> dict:
+        return {
+            "type": "player_joined",
+            "user_id": player.user_id,
+            "slot": player.slot,
+            "username": player.username,
+            "appearance": player.appearance,
+            "room_x": player.room_x,
+            "room_y": player.room_y
+        }
+
+    def _unseen_appearances(self, conn: Connection, players: Iterable[Player]) -> dict:
+        """Appearances among players that conn's client hasn't been sent yet (now marked as sent)"""
+        unseen = {}
+        known = conn.known_appearances
+        for player in players:
+            appearance = player.appearance
+            if appearance is not None and appearance not in known:
+                known.add(appearance)
+                unseen[appearance] = player.character
+        return unseen
+
+    def _deliver_joined(self, player: Player, exclude_websocket: WebSocket = None):
+        """player_joined to the room and its watchers; clients that lack the appearance get it first"""
+        room_key = player.room_key
+        appearance = player.appearance
+        if appearance is not None:
+            # Recipients may fetch it by hash later
+            appearances.keep(appearance, player.character)
+            frame = None
+            for recipients in (self.room_connections.get(room_key, ()), self.room_watchers.get(room_key, ())):
+                for conn in recipients:
+                    if appearance not in conn.known_appearances and conn.websocket is not exclude_websocket:
+                        conn.known_appearances.add(appearance)
+                        if frame is None:
+                            frame = encode({"type": "appearances", "appearances": {appearance: player.character}})
+                        conn.queue.put(frame)
+        self._deliver_room(room_key, encode(self._joined_message(player)), exclude_websocket, include_watchers=True)
+
+    def _left_message(self, player: Player) -> dict:
+        return {
+            "type": "player_left",
+            "user_id": player.user_id,
+            "username": player.username,
+            "room_x": player.room_x,
+            "room_y": player.room_y
+        }
+
+    def _neighbour_rooms(self, maze_id: int, room_x: int, room_y: int) -> Dict[RoomKey, Tuple[int, int]]:
+        """Door-connected rooms, from the cached door grid (none until the grid is loaded)"""
+        grid = door_grids.get(maze_id)
+        if grid is None:
+            return {}
+        return {(maze_id, x, y): (x, y) for x, y in grid.neighbours(room_x, room_y)}
+
+    def _watch(self, conn: Connection, room_keys):
+        for room_key in room_keys:
+            self.room_watchers.setdefault(room_key, set()).add(conn)
+
+    def _unwatch(self, conn: Connection, room_keys):
+        for room_key in room_keys:
+            watchers = self.room_watchers.get(room_key)
+            if watchers is not None:
+                watchers.discard(conn)
+                if not watchers:
+                    del self.room_watchers[room_key]
+                    self.near_dirty.pop(room_key, None)
+
+    async def _send_neighbours(self, conn: Connection, added, dropped):
+        """Tell a client which neighbour rooms it now sees (with their players) and which it stopped seeing"""
+        rooms = []
+        unseen = {}
+        for room_key in added:
+            players = await self.get_players_in_room(room_key, exclude_user=conn.user_id)
+            if players:
+                room_x, room_y = conn.watching[room_key]
+                rooms.append({"room_x": room_x, "room_y": room_y, "players": players})
+                unseen.update(self._unseen_appearances(conn, self._members(room_key)))
+
+        if rooms or dropped:
+            conn.queue.put(encode({
+                "type": "neighbour_players",
+                "rooms": rooms,
+                "appearances": unseen,
+                "dropped": list(dropped)
+            }))
+
+    def get_occupied_rooms(self, maze_id: int) -> AbstractSet[Tuple[int, int]]:
+        """Rooms of a maze with at least one connected player (live view, O(1) on a single process)"""
+        local = self.maze_rooms.get(maze_id, {}).keys()
+        remote = self.remote_rooms.get(maze_id)
+        return local | remote.keys() if remote else local
+
+    # --- Cross-process fan-out -------------------------------------------------
+    # Payloads are a JSON header line, then (for messages) the client frame as
+    # encoded once by the publisher. Presence (join/leave/poses) is mirrored as
+    # RemotePlayer records, so each process names players with its own slots.
+
+    async def start_broker(self, url: str = None):
+        """Switch to the broker for BROKER_URL and announce ourselves to the other processes"""
+        broker = create_broker(settings.BROKER_URL if url is None else url)
+        await broker.start(self._on_broker_message)
+        self.broker = broker
+        handshake_cache.on_forget = self._publish_forget
+        self._publish({"kind": "hello"})
+        for conn in self.connections.values():
+            self._publish_join(conn)
 
-    def _room_key(self, maze_id: int, room_x: int, room_y: int) -> str:
-        return f"{maze_id}:{room_x}:{room_y}"
+    async def stop_broker(self):
+        """Tell the other processes our players are gone, then disconnect from the broker"""
+        self._publish({"kind": "bye"})
+        await self.broker.flush()
+        await self.broker.close()
+        self.broker = LocalBroker()
+        handshake_cache.on_forget = None
+
+    def _publish(self, header: dict, frame: str = "", droppable: bool = False):
+        if self.broker.distributed:
+            header["origin"] = self.broker.node_id
+            self.broker.publish(encode(header) + "\n" + frame, droppable)
+
+    def send_to_leader(self, what: str, item: dict):
+        """Hand item to the leader's handler for `what`: directly if we lead, else through the broker"""
+        handler = self.leader_handlers.get(what)
+        if handler is not None:
+            handler(item)
+        else:
+            self._publish({"kind": "leader", "what": what, "item": item})
+
+    def _publish_forget(self, what: str, user_id: int):
+        self._publish({"kind": "forget", "what": what, "user_id": user_id})
+
+    def _publish_join(self, player: Connection):
+        self._publish({
+            "kind": "join",
+            "user_id": player.user_id,
+            "username": player.username,
+            "character": player.character,
+            "room": player.room_key,
+            "pose": [player.pos_x, player.pos_y, player.pos_z, player.yaw, player.pitch]
+        })
+
+    async def _on_broker_message(self, payload: str):
+        header_text, _, frame = payload.partition("\n")
+        try:
+            header = json.loads(header_text)
+            origin = header.get("origin")
+            if origin == self.broker.node_id:
+                return
+
+            kind = header["kind"]
+            if kind == "room":
+                self._deliver_room(tuple(header["room"]), frame, None, header["droppable"], header["watchers"])
+                if header.get("chat"):
+                    # Persisted by the sender's process; we only keep it for players entering the room
+                    chat_log.remember(tuple(header["room"]), json.loads(frame))
+            elif kind == "maze":
+                self._deliver_maze(header["maze_id"], frame)
+            elif kind == "user":
+                conn = self.user_connections.get(header["user_id"])
+                if conn is not None:
+                    conn.queue.put(frame)
+            elif kind == "poses":
+                self._remote_poses(tuple(header["room"]), header["players"])
+            elif kind == "join":
+                self._remote_join(origin, header)
+            elif kind == "session_room":
+                room_key = tuple(header["room"])
+                handshake_cache.move_session(header["user_id"], *room_key)
+                await self._apply_session_room(header["user_id"], room_key)
+            elif kind == "forget":
+                handshake_cache.forget(header["what"], header["user_id"], publish=False)
+            elif kind == "leave":
+                self._remote_leave(header["user_id"])
+            elif kind == "hello":
+                # A process (re)started - let it know who is connected here
+                for conn in self.connections.values():
+                    self._publish_join(conn)
+            elif kind == "leader":
+                # Only the leader has handlers; the other processes ignore it
+                handler = self.leader_handlers.get(header["what"])
+                if handler is not None:
+                    handler(header["item"])
+            elif kind == "bye":
+                for player in [p for p in self.remote_players.values() if p.origin == origin]:
+                    self._remote_leave(player.user_id)
+        except Exception as e:
+            metrics.inc("broker.errors")
+            print(f"Broker message error: {e}")
+
+    def _remote_join(self, origin: str, header: dict):
+        user_id = header["user_id"]
+        if user_id in self.remote_players:
+            self._remote_leave(user_id)
+
+        maze_id, room_x, room_y = header["room"]
+        player = RemotePlayer(
+            origin, user_id, header["username"], maze_id, room_x, room_y, header["character"], self._take_slot()
+        )
+        player.pos_x, player.pos_y, player.pos_z, player.yaw, player.pitch = header["pose"]
+        self.remote_players[user_id] = player
+        self._join_room(player, self.remote_members, self.remote_rooms)
+        self._deliver_joined(player)
+
+    def _remote_leave(self, user_id: int):
+        player = self.remote_players.pop(user_id, None)
+        if player is None:
+            return
+
+        room_key = player.room_key
+        self._leave_room(player, self.remote_members, self.remote_rooms)
+        self._clear_dirty(self.dirty_poses, room_key, player)
+        self._clear_dirty(self.near_dirty, room_key, player)
+        self._free_slots.append(player.slot)
+        self._deliver_room(room_key, encode(self._left_message(player)), include_watchers=True)
+
+    def _remote_poses(self, room_key: RoomKey, poses: list):
+        """Poses of another process' movers; our next snapshot tick sends them on"""
+        watched = room_key in self.room_watchers
+        for pose in poses:
+            player = self.remote_players.get(pose["user_id"])
+            if player is None or player.room_key != room_key:
+                continue
+            player.pos_x = pose["pos_x"]
+            player.pos_y = pose["pos_y"]
+            player.pos_z = pose["pos_z"]
+            player.yaw = pose["yaw"]
+            player.pitch = pose["pitch"]
+            self.dirty_poses.setdefault(room_key, set()).add(player)
+            if watched:
+                self.near_dirty.setdefault(room_key, set()).add(player)
 
     async def connect(
         self,
@@ -35,88 +451,271 @@ class ConnectionManager:
         maze_id: int,
         room_x: int,
         room_y: int,
-        character_data: dict = None
+        character_data: dict = None,
+        binary_poses: bool = False
     ):
-        """Connect a user to a room"""
-        await websocket.accept()
+        """Connect a user to a room; binary_poses = client negotiated the binary pose sub-protocol"""
+        if binary_poses:
+            await websocket.accept(subprotocol=pose_codec.SUBPROTOCOL)
+        else:
+            await websocket.accept()
 
-        room_key = self._room_key(maze_id, room_x, room_y)
+        # Everything sent to this client goes through its own queue and writer task
+        queue = SendQueue(websocket)
+        conn = Connection(
+            websocket, user_id, username, session_id, maze_id, room_x, room_y,
+            character_data, queue, self._take_slot(), binary_poses
+        )
+        queue.on_drop = lambda: self.resync.add(conn)
+        queue.on_error = lambda: self._reap_soon(conn)
+        queue.start()
 
-        if room_key not in self.room_connections:
-            self.room_connections[room_key] = set()
-
-        connection_tuple = (websocket, user_id, session_id)
-        self.room_connections[room_key].add(connection_tuple)
-        self.user_connections[user_id] = websocket
-        self.connection_data[websocket] = {
-            "user_id": user_id,
-            "username": username,
-            "session_id": session_id,
-            "maze_id": maze_id,
-            "room_x": room_x,
-            "room_y": room_y,
-            "pos_x": 0,
-            "pos_y": 1.6,
-            "pos_z": 0,
-            "yaw": 0,
-            "pitch": 0,
-            "character": character_data
-        }
+        # A reconnect leaves the old socket behind; don't wait for it to time out
+        previous = self.user_connections.get(user_id)
+        if previous is not None:
+            self._reap_soon(previous)
 
-        # Notify others in room
-        await self.broadcast_to_room(
-            room_key,
-            {
-                "type": "player_joined",
-                "user_id": user_id,
-                "username": username,
-                "character": character_data
-            },
-            exclude_websocket=websocket
-        )
+        self.connections[websocket] = conn
+        self.heartbeats.schedule(conn, conn.last_seen + settings.WS_HEARTBEAT_IDLE, conn)
+        self.user_connections[user_id] = conn
+        self.maze_connections.setdefault(maze_id, set()).add(conn)
+        self._join_room(conn)
+        room_key = conn.room_key
+
+        # Notify others in room (and those looking in from neighbour rooms)
+        self._deliver_joined(conn, websocket)
+        self._publish_join(conn)
 
         # Send current players in room to new connection
         players_in_room = await self.get_players_in_room(room_key, exclude_user=user_id)
-        await websocket.send_json({
+        queue.put(encode({
             "type": "room_players",
-            "players": players_in_room
-        })
+            "room_x": room_x,
+            "room_y": room_y,
+            "players": players_in_room,
+            "appearances": self._unseen_appearances(conn, self._members(room_key)),
+            "chat": chat_log.recent(room_key)
+        }))
+
+        conn.watching = self._neighbour_rooms(maze_id, room_x, room_y)
+        self._watch(conn, conn.watching)
+        await self._send_neighbours(conn, conn.watching, ())
 
     async def disconnect(self, websocket: WebSocket):
         """Disconnect a user"""
-        if websocket not in self.connection_data:
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
             return
 
-        data = self.connection_data[websocket]
-        user_id = data["user_id"]
-        room_key = self._room_key(data["maze_id"], data["room_x"], data["room_y"])
+        room_key = conn.room_key
+        self.heartbeats.cancel(conn)
+        self._leave_room(conn)
+        self._unwatch(conn, conn.watching)
+        self._clear_dirty(self.dirty_poses, room_key, conn)
+        self._clear_dirty(self.near_dirty, room_key, conn)
+        self.resync.discard(conn)
+        self.pending_poses.discard(conn)
 
-        # Remove from room
-        if room_key in self.room_connections:
-            self.room_connections[room_key] = {
-                conn for conn in self.room_connections[room_key]
-                if conn[0] != websocket
-            }
-            if not self.room_connections[room_key]:
-                del self.room_connections[room_key]
+        maze_connections = self.maze_connections.get(conn.maze_id)
+        if maze_connections is not None:
+            maze_connections.discard(conn)
+            if not maze_connections:
+                del self.maze_connections[conn.maze_id]
 
-        # Remove user connection
-        if user_id in self.user_connections:
-            del self.user_connections[user_id]
+        # A reconnect may already have replaced this user's connection
+        current = self.user_connections.get(conn.user_id)
+        if current is conn:
+            del self.user_connections[conn.user_id]
 
-        # Remove connection data
-        del self.connection_data[websocket]
+        # Stop its writer and free the slot
+        conn.queue.close()
+        self._free_slots.append(conn.slot)
 
-        # Notify others
-        await self.broadcast_to_room(
-            room_key,
-            {
-                "type": "player_left",
-                "user_id": user_id,
-                "username": data["username"]
+        # Notify others - unless the user is still here on the connection that replaced this one
+        if current is None or current is conn:
+            self._deliver_room(room_key, encode(self._left_message(conn)), include_watchers=True)
+            self._publish({"kind": "leave", "user_id": conn.user_id})
+        elif current.room_key != room_key:
+            self._deliver_room(room_key, encode(self._left_message(conn)), include_watchers=True)
+
+    def touch(self, websocket: WebSocket):
+        """A frame arrived - the client is alive"""
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            conn.last_seen = time.monotonic()
+
+    def _reap_soon(self, conn: Connection):
+        """Evict on the next reaper tick (dead writer, or replaced by a reconnect)"""
+        if conn in self.heartbeats:
+            self.heartbeats.schedule(conn, 0.0, conn)
+
+    async def check_heartbeats(self, now: float = None):
+        """Ping connections idle for WS_HEARTBEAT_IDLE, evict the ones that stay silent for WS_HEARTBEAT_TIMEOUT"""
+        now = time.monotonic() if now is None else now
+        evict = []
+        for conn, _ in self.heartbeats.advance(now):
+            if conn.queue.closed:
+                evict.append((conn, "Send failed"))
+            elif self.user_connections.get(conn.user_id) is not conn:
+                evict.append((conn, "Replaced by a new connection"))
+            elif now - conn.last_seen < settings.WS_HEARTBEAT_IDLE:
+                # Heard from it since the check was scheduled
+                conn.pinged = False
+                self.heartbeats.schedule(conn, conn.last_seen + settings.WS_HEARTBEAT_IDLE, conn)
+            elif not conn.pinged:
+                conn.pinged = True
+                conn.queue.put(encode({"type": "ping"}))
+                self.heartbeats.schedule(conn, now + settings.WS_HEARTBEAT_TIMEOUT, conn)
+                metrics.inc("ws.heartbeat.pings")
+            else:
+                evict.append((conn, "Heartbeat timeout"))
+
+        for conn, reason in evict:
+            # Close the socket too, so its receive loop ends; its own disconnect() is then a no-op
+            conn.queue.close(code=1001, reason=reason)
+            await self.disconnect(conn.websocket)
+        if evict:
+            metrics.inc("ws.heartbeat.evicted", len(evict))
+        metrics.set_gauge("ws.connections", len(self.connections))
+
+    async def run_heartbeats(self):
+        """Background task: advance the heartbeat wheel every WS_HEARTBEAT_TICK seconds"""
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_TICK)
+            try:
+                await self.check_heartbeats()
+            except Exception as e:
+                print(f"Heartbeat error: {e}")
+
+    def _position_upsert(self, db):
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(PlayerPosition)
+        return statement.on_conflict_do_update(
+            index_elements=[PlayerPosition.session_id],
+            set_={
+                **{name: statement.excluded[name] for name in POSITION_COLUMNS},
+                "last_updated": func.now()
             }
         )
 
+    def _position_row(self, conn: Connection) -> dict:
+        return {
+            "session_id": conn.session_id,
+            "room_x": conn.room_x,
+            "room_y": conn.room_y,
+            "pos_x": conn.pos_x,
+            "pos_y": conn.pos_y,
+            "pos_z": conn.pos_z,
+            "yaw": conn.yaw,
+            "pitch": conn.pitch
+        }
+
+    async def flush_positions(self) -> int:
+        """Upsert the latest pose of every changed connection into PlayerPosition in one statement"""
+        unsaved, self.unsaved_positions = self.unsaved_positions, set()
+        if not unsaved:
+            return 0
+        rows = {conn: self._position_row(conn) for conn in unsaved}
+
+        try:
+            async with async_session() as db:
+                await db.execute(self._position_upsert(db), list(rows.values()))
+                await db.commit()
+            failed = ()
+        except Exception as e:
+            print(f"Position flush error ({len(rows)} rows): {e}")
+            # One bad row fails the whole statement - find it so the rest still get saved
+            failed = await self._flush_positions_one_by_one(rows)
+
+        for conn in unsaved:
+            if conn not in failed:
+                self.position_failures.pop(conn, None)
+        for conn in failed:
+            attempts = self.position_failures.get(conn, 0) + 1
+            if attempts < settings.WS_POSITION_FLUSH_ATTEMPTS:
+                # Retry with the next flush; newer poses are read from the connection then
+                self.position_failures[conn] = attempts
+                self.unsaved_positions.add(conn)
+            else:
+                self.position_failures.pop(conn, None)
+                metrics.inc("ws.positions.dropped")
+                print(f"Position of session {conn.session_id} dropped after {attempts} failed flushes")
+
+        saved = len(rows) - len(failed)
+        metrics.inc("ws.positions.flushed", saved)
+        return saved
+
+    async def _flush_positions_one_by_one(self, rows: Dict[Connection, dict]) -> Set[Connection]:
+        """Upsert each row in its own savepoint; the connections whose row failed"""
+        failed = set()
+        try:
+            async with async_session() as db:
+                await db.connection()  # fails here, once, if the database is down
+                statement = self._position_upsert(db)
+                for conn, row in rows.items():
+                    try:
+                        async with db.begin_nested():
+                            await db.execute(statement, [row])
+                    except Exception as e:
+                        failed.add(conn)
+                        print(f"Position flush error (session {conn.session_id}): {e}")
+                await db.commit()
+        except Exception as e:
+            # The database itself is unavailable: every row counts as failed
+            print(f"Position flush error: {e}")
+            return set(rows)
+        return failed
+
+    async def run_position_flush(self):
+        """Background task: write-behind of live poses every WS_POSITION_FLUSH_INTERVAL seconds"""
+        while True:
+            await asyncio.sleep(settings.WS_POSITION_FLUSH_INTERVAL)
+            try:
+                await self.flush_positions()
+            except Exception as e:
+                print(f"Position flush error: {e}")
+
+    async def set_session_room(self, user_id: int, maze_id: int, room_x: int, room_y: int):
+        """The HTTP routes moved a player (door, portal, teleport trap) - follow on whichever process it is"""
+        room_key = (maze_id, room_x, room_y)
+        handshake_cache.move_session(user_id, maze_id, room_x, room_y)
+        # Every process hears it: the player's connection may be elsewhere, and any
+        # process may serve their next reconnect from its handshake cache
+        self._publish({"kind": "session_room", "user_id": user_id, "room": room_key})
+        await self._apply_session_room(user_id, room_key)
+
+    async def _apply_session_room(self, user_id: int, room_key: RoomKey):
+        conn = self.user_connections.get(user_id)
+        if conn is None or conn.maze_id != room_key[0]:
+            return
+        conn.session_room = room_key
+        if conn.room_key != room_key:
+            await self.change_room(conn.websocket, room_key[1], room_key[2])
+
+    async def request_room_change(self, websocket: WebSocket, room_x, room_y):
+        """Client-reported room change; only the session room (where the HTTP routes put the player) is accepted.
+
+        Rooms are entered through /api/maze/move and friends, which apply traps, rewards,
+        freezes and visited rooms - the WebSocket only follows them.
+        """
+        conn = self.connections.get(websocket)
+        if conn is None:
+            return
+
+        if type(room_x) is int and type(room_y) is int:
+            target = (conn.maze_id, room_x, room_y)
+            if target == conn.session_room:
+                if target != conn.room_key:
+                    await self.change_room(websocket, room_x, room_y)
+                return
+
+        metrics.inc("ws.room_change.rejected")
+        conn.queue.put(encode({
+            "type": "room_change_rejected",
+            "room_x": conn.session_room[1],
+            "room_y": conn.session_room[2]
+        }))
+
     async def change_room(
         self,
         websocket: WebSocket,
@@ -124,60 +723,55 @@ class ConnectionManager:
         new_room_y: int
     ):
         """Move player to a new room"""
-        if websocket not in self.connection_data:
+        conn = self.connections.get(websocket)
+        if conn is None:
             return
 
-        data = self.connection_data[websocket]
-        old_room_key = self._room_key(data["maze_id"], data["room_x"], data["room_y"])
-        new_room_key = self._room_key(data["maze_id"], new_room_x, new_room_y)
+        old_room_key = conn.room_key
 
         # Remove from old room
-        if old_room_key in self.room_connections:
-            self.room_connections[old_room_key] = {
-                conn for conn in self.room_connections[old_room_key]
-                if conn[0] != websocket
-            }
-
-            # Notify old room
-            await self.broadcast_to_room(
-                old_room_key,
-                {
-                    "type": "player_left",
-                    "user_id": data["user_id"],
-                    "username": data["username"]
-                }
-            )
-
-        # Update data
-        data["room_x"] = new_room_x
-        data["room_y"] = new_room_y
+        self._leave_room(conn)
+        self._clear_dirty(self.dirty_poses, old_room_key, conn)
+        self._clear_dirty(self.near_dirty, old_room_key, conn)
+        # A queued pose belongs to the old room's coordinates
+        conn.pending_pose = None
+        self.pending_poses.discard(conn)
 
-        # Add to new room
-        if new_room_key not in self.room_connections:
-            self.room_connections[new_room_key] = set()
+        # Notify old room
+        self._deliver_room(old_room_key, encode(self._left_message(conn)), include_watchers=True)
 
-        self.room_connections[new_room_key].add(
-            (websocket, data["user_id"], data["session_id"])
-        )
+        # Add to new room (which gets the pose via room_players)
+        conn.room_x = new_room_x
+        conn.room_y = new_room_y
+        conn.pose_sent = None
+        conn.pose_sent_near = None
+        self._join_room(conn)
+        self.unsaved_positions.add(conn)
+        new_room_key = conn.room_key
 
-        # Notify new room
-        await self.broadcast_to_room(
-            new_room_key,
-            {
-                "type": "player_joined",
-                "user_id": data["user_id"],
-                "username": data["username"],
-                "character": data["character"]
-            },
-            exclude_websocket=websocket
-        )
+        # Notify new room (other processes move their copy of us)
+        self._deliver_joined(conn, websocket)
+        self._publish_join(conn)
 
         # Send players in new room
-        players = await self.get_players_in_room(new_room_key, exclude_user=data["user_id"])
-        await websocket.send_json({
+        players = await self.get_players_in_room(new_room_key, exclude_user=conn.user_id)
+        conn.queue.put(encode({
             "type": "room_players",
-            "players": players
-        })
+            "room_x": new_room_x,
+            "room_y": new_room_y,
+            "players": players,
+            "appearances": self._unseen_appearances(conn, self._members(new_room_key)),
+            "chat": chat_log.recent(new_room_key)
+        }))
+
+        # Neighbour rooms mostly overlap (the old room becomes one) - only apply the difference
+        old_watching = conn.watching
+        conn.watching = self._neighbour_rooms(conn.maze_id, new_room_x, new_room_y)
+        added = conn.watching.keys() - old_watching.keys()
+        dropped = old_watching.keys() - conn.watching.keys()
+        self._unwatch(conn, dropped)
+        self._watch(conn, added)
+        await self._send_neighbours(conn, added, [old_watching[key] for key in dropped])
 
     async def update_position(
         self,
@@ -188,104 +782,319 @@ class ConnectionManager:
         yaw: float,
         pitch: float
     ):
-        """Update player position and broadcast to room"""
-        if websocket not in self.connection_data:
+        """Record the latest pose; the next snapshot tick sends it to the room"""
+        conn = self.connections.get(websocket)
+        if conn is None:
             return
 
-        data = self.connection_data[websocket]
-        data["pos_x"] = pos_x
-        data["pos_y"] = pos_y
-        data["pos_z"] = pos_z
-        data["yaw"] = yaw
-        data["pitch"] = pitch
+        # Token bucket: a client sending faster than WS_POSE_RATE only gets its
+        # newest pose applied, once per tick
+        now = time.monotonic()
+        conn.tokens = min(settings.WS_POSE_BURST, conn.tokens + (now - conn.tokens_at) * settings.WS_POSE_RATE)
+        conn.tokens_at = now
+        if conn.tokens < 1:
+            if conn.pending_pose is not None:
+                metrics.inc("ws.pose.coalesced")
+            conn.pending_pose = (pos_x, pos_y, pos_z, yaw, pitch)
+            self.pending_poses.add(conn)
+            return
+        conn.tokens -= 1
+        if conn.pending_pose is not None:
+            conn.pending_pose = None
+            self.pending_poses.discard(conn)
+            metrics.inc("ws.pose.coalesced")
 
-        room_key = self._room_key(data["maze_id"], data["room_x"], data["room_y"])
+        self._set_pose(conn, pos_x, pos_y, pos_z, yaw, pitch)
 
-        await self.broadcast_to_room(
-            room_key,
-            {
-                "type": "player_moved",
-                "user_id": data["user_id"],
-                "pos_x": pos_x,
-                "pos_y": pos_y,
-                "pos_z": pos_z,
-                "yaw": yaw,
-                "pitch": pitch
-            },
-            exclude_websocket=websocket
-        )
+    def _set_pose(self, conn: Connection, pos_x: float, pos_y: float, pos_z: float, yaw: float, pitch: float):
+        conn.pos_x = pos_x
+        conn.pos_y = pos_y
+        conn.pos_z = pos_z
+        conn.yaw = yaw
+        conn.pitch = pitch
+
+        room_key = conn.room_key
+        self.dirty_poses.setdefault(room_key, set()).add(conn)
+        if room_key in self.room_watchers:
+            self.near_dirty.setdefault(room_key, set()).add(conn)
+        self.unsaved_positions.add(conn)
+
+    def _clear_dirty(self, dirty_poses: Dict[RoomKey, Set[Player]], room_key: RoomKey, player: Player):
+        dirty = dirty_poses.get(room_key)
+        if dirty is not None:
+            dirty.discard(player)
+            if not dirty:
+                del dirty_poses[room_key]
+
+    def _pose(self, player: Player) -> dict:
+        return {
+            "user_id": player.user_id,
+            "pos_x": player.pos_x,
+            "pos_y": player.pos_y,
+            "pos_z": player.pos_z,
+            "yaw": player.yaw,
+            "pitch": player.pitch
+        }
+
+    def _quantized(self, player: Player) -> pose_codec.Pose:
+        return pose_codec.quantize_pose(player.pos_x, player.pos_y, player.pos_z, player.yaw, player.pitch)
+
+    def _binary_snapshot(self, movers: Set[Player], baseline: str) -> Optional[bytes]:
+        """Changed fields of each mover since its previous binary snapshot; None if nothing changed"""
+        entries = []
+        for conn in movers:
+            pose = self._quantized(conn)
+            mask = pose_codec.changed_mask(pose, getattr(conn, baseline))
+            if mask:
+                entries.append((conn.slot, mask, pose))
+                setattr(conn, baseline, pose)
+        return pose_codec.encode_snapshot(entries) if entries else None
+
+    def _fan_out_snapshot(self, recipients, movers: Set[Player], baseline: str, skip: Set[Connection]):
+        """Queue one snapshot of the movers to each recipient, encoding each format once"""
+        json_frame = binary_frame = None
+        binary_encoded = False
+
+        for conn in recipients:
+            if conn in skip:
+                continue
+            if conn.binary:
+                if not binary_encoded:
+                    binary_frame = self._binary_snapshot(movers, baseline)
+                    binary_encoded = True
+                    if binary_frame:
+                        metrics.observe("ws.snapshot.frame_bytes:binary", len(binary_frame))
+                if binary_frame:
+                    conn.queue.put(binary_frame, True)
+            else:
+                if json_frame is None:
+                    json_frame = encode({"type": "room_snapshot", "players": [self._pose(m) for m in movers]})
+                    metrics.observe("ws.snapshot.frame_bytes:json", len(json_frame))
+                conn.queue.put(json_frame, True)
+
+    async def flush_snapshots(self):
+        """Send the poses changed since the last tick: every tick to the room, every Nth to its neighbours"""
+        self._tick += 1
+
+        # Newest over-budget pose of each rate-limited client
+        pending_poses, self.pending_poses = self.pending_poses, set()
+        for conn in pending_poses:
+            if conn.pending_pose is not None:
+                self._set_pose(conn, *conn.pending_pose)
+                conn.pending_pose = None
+
+        dirty_poses, self.dirty_poses = self.dirty_poses, {}
+        resync, self.resync = self.resync, set()
+
+        # Clients skip their own entry; a room that fails doesn't hold up the others
+        for room_key, movers in dirty_poses.items():
+            try:
+                self._fan_out_snapshot(self.room_connections.get(room_key, ()), movers, "pose_sent", resync)
+                metrics.observe("ws.snapshot.players", len(movers))
+
+                if self.broker.distributed:
+                    # Our own movers, once per room and tick, for the other processes' snapshots
+                    local = [self._pose(m) for m in movers if m.__class__ is Connection]
+                    if local:
+                        self._publish({"kind": "poses", "room": room_key, "players": local}, droppable=True)
+            except Exception as e:
+                print(f"Snapshot error in room {room_key}: {e}")
+
+        # Neighbour rooms are only seen through doors - a lower rate is enough
+        if self._tick % settings.WS_NEIGHBOUR_SNAPSHOT_EVERY == 0:
+            near_dirty, self.near_dirty = self.near_dirty, {}
+            for room_key, movers in near_dirty.items():
+                try:
+                    self._fan_out_snapshot(self.room_watchers.get(room_key, ()), movers, "pose_sent_near", resync)
+                    metrics.observe("ws.snapshot.neighbour_players", len(movers))
+                except Exception as e:
+                    print(f"Neighbour snapshot error in room {room_key}: {e}")
+
+        # Clients whose queue dropped a snapshot get every pose they can see,
+        # so stationary players and the binary delta baselines are right again
+        for conn in resync:
+            if conn.queue.closed:
+                continue
+            try:
+                self._resync(conn)
+            except Exception as e:
+                print(f"Snapshot resync error for user {conn.user_id}: {e}")
+
+    def _resync(self, conn: Connection):
+        """Queue every pose the client can see, as one full snapshot"""
+        others = [
+            other
+            for room_key in (conn.room_key, *conn.watching)
+            for other in self._members(room_key)
+            if other is not conn
+        ]
+        if conn.binary:
+            frame = pose_codec.encode_snapshot(
+                (other.slot, pose_codec.FULL_MASK, self._quantized(other)) for other in others
+            )
+        else:
+            frame = encode({"type": "room_snapshot", "players": [self._pose(other) for other in others]})
+        conn.queue.put(frame, True)
+        metrics.inc("ws.snapshot.resyncs")
+
+    async def run_snapshots(self):
+        """Background task: flush dirty poses WS_SNAPSHOT_HZ times per second"""
+        loop = asyncio.get_running_loop()
+        interval = 1 / settings.WS_SNAPSHOT_HZ
+        next_tick = loop.time()
+
+        while True:
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+            started = loop.time()
+            # How late we woke up - a busy event loop delays every timer
+            self.loop_lag = 0.9 * self.loop_lag + 0.1 * max(0.0, started - next_tick)
+            try:
+                await self.flush_snapshots()
+                if self._tick % max(1, int(settings.WS_SNAPSHOT_HZ)) == 0:
+                    self.update_rate_hints()
+            except Exception as e:
+                print(f"Snapshot tick error: {e}")
+            metrics.observe("ws.snapshot.tick_ms", (loop.time() - started) * 1000)
+
+            # Fell behind (e.g. a long GC pause) - skip ticks instead of bursting
+            if loop.time() - next_tick > interval:
+                metrics.inc("ws.snapshot.skipped_ticks")
+                next_tick = loop.time()
+
+    def _rate_hint(self, occupants: int, loaded: bool) -> int:
+        """Pose send interval (ms) for a room: longer when crowded or when this process is loaded"""
+        interval = settings.WS_POSE_INTERVAL_MS
+        if occupants > settings.WS_CROWDED_ROOM:
+            interval = interval * occupants / settings.WS_CROWDED_ROOM
+        if loaded:
+            interval *= 2
+        # 50 ms steps so small changes in occupancy don't resend hints
+        return min(1000, int(round(interval / 50)) * 50)
+
+    def update_rate_hints(self):
+        """Send rate_hint to connections whose recommended interval changed (about once a second)"""
+        loaded = self.loop_lag > settings.WS_LOADED_LAG
+        metrics.set_gauge("ws.loop_lag_ms", self.loop_lag * 1000)
+
+        for room_key, members in self.room_connections.items():
+            hint = self._rate_hint(len(members) + len(self.remote_members.get(room_key, ())), loaded)
+            frame = None
+            for conn in members:
+                if conn.rate_hint != hint:
+                    conn.rate_hint = hint
+                    if frame is None:
+                        frame = encode({"type": "rate_hint", "interval_ms": hint})
+                    conn.queue.put(frame)
+                    metrics.inc("ws.rate_hints")
 
     async def send_chat(self, websocket: WebSocket, message: str):
-        """Send chat message to room"""
-        if websocket not in self.connection_data:
+        """Send chat message to room; kept for players entering it and persisted in the background"""
+        conn = self.connections.get(websocket)
+        if conn is None:
             return
 
-        data = self.connection_data[websocket]
-        room_key = self._room_key(data["maze_id"], data["room_x"], data["room_y"])
+        now = datetime.utcnow()
+        chat_message = {
+            "type": "chat_message",
+            "user_id": conn.user_id,
+            "username": conn.username,
+            "message": message,
+            "timestamp": now.isoformat()
+        }
+        room_key = conn.room_key
+        chat_log.add(room_key, chat_message, conn.user_id, now)
 
-        await self.broadcast_to_room(
-            room_key,
-            {
-                "type": "chat_message",
-                "user_id": data["user_id"],
-                "username": data["username"],
-                "message": message,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
+        frame = encode(chat_message)
+        self._deliver_room(room_key, frame)
+        self._publish({"kind": "room", "room": room_key, "droppable": False, "watchers": False, "chat": True}, frame)
+
+    def send(self, websocket: WebSocket, message: dict, droppable: bool = False):
+        """Queue a message for one connection; never waits on the client"""
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            conn.queue.put(encode(message), droppable)
+
+    async def send_to_user(self, user_id: int, message: dict):
+        """Send a message to one user, on whichever process it is connected to"""
+        conn = self.user_connections.get(user_id)
+        if conn is not None:
+            conn.queue.put(encode(message))
+        elif self.broker.distributed:
+            self._publish({"kind": "user", "user_id": user_id}, encode(message))
+
+    def _deliver_room(
+        self,
+        room_key: RoomKey,
+        frame: str,
+        exclude_websocket: WebSocket = None,
+        droppable: bool = False,
+        include_watchers: bool = False
+    ):
+        """Queue an encoded frame to this process' connections in (or watching) a room"""
+        for recipients in (
+            self.room_connections.get(room_key, ()),
+            self.room_watchers.get(room_key, ()) if include_watchers else (),
+        ):
+            for conn in recipients:
+                if conn.websocket is not exclude_websocket:
+                    conn.queue.put(frame, droppable)
+
+    def _deliver_maze(self, maze_id: int, frame: str):
+        for conn in self.maze_connections.get(maze_id, ()):
+            conn.queue.put(frame)
 
     async def broadcast_to_room(
         self,
-        room_key: str,
+        room_key: RoomKey,
         message: dict,
-        exclude_websocket: WebSocket = None
+        exclude_websocket: WebSocket = None,
+        droppable: bool = False,
+        include_watchers: bool = False
     ):
-        """Broadcast message to all users in a room"""
-        if room_key not in self.room_connections:
+        """Broadcast message to all users in a room (encoded once, published once, queued per recipient)"""
+        if not self.broker.distributed and room_key not in self.room_connections and not (
+            include_watchers and room_key in self.room_watchers
+        ):
             return
 
-        for ws, user_id, session_id in self.room_connections[room_key]:
-            if ws != exclude_websocket:
-                try:
-                    await ws.send_json(message)
-                except Exception:
-                    pass
+        frame = encode(message)
+        self._deliver_room(room_key, frame, exclude_websocket, droppable, include_watchers)
+        self._publish(
+            {"kind": "room", "room": room_key, "droppable": droppable, "watchers": include_watchers}, frame, droppable
+        )
 
     async def broadcast_to_maze(self, maze_id: int, message: dict):
-        """Broadcast message to all users in a maze"""
-        for room_key in self.room_connections:
-            if room_key.startswith(f"{maze_id}:"):
-                for ws, user_id, session_id in self.room_connections[room_key]:
-                    try:
-                        await ws.send_json(message)
-                    except Exception:
-                        pass
+        """Broadcast message to all users in a maze (encoded once, published once, queued per recipient)"""
+        if not self.broker.distributed and maze_id not in self.maze_connections:
+            return
+
+        frame = encode(message)
+        self._deliver_maze(maze_id, frame)
+        self._publish({"kind": "maze", "maze_id": maze_id}, frame)
 
     async def get_players_in_room(
         self,
-        room_key: str,
+        room_key: RoomKey,
         exclude_user: int = None
     ) -> list:
         """Get all players in a room"""
-        players = []
-        if room_key not in self.room_connections:
-            return players
-
-        for ws, user_id, session_id in self.room_connections[room_key]:
-            if user_id != exclude_user and ws in self.connection_data:
-                data = self.connection_data[ws]
-                players.append({
-                    "user_id": user_id,
-                    "username": data["username"],
-                    "pos_x": data["pos_x"],
-                    "pos_y": data["pos_y"],
-                    "pos_z": data["pos_z"],
-                    "yaw": data["yaw"],
-                    "pitch": data["pitch"],
-                    "character": data["character"]
-                })
-
-        return players
+        return [
+            {
+                "user_id": conn.user_id,
+                "slot": conn.slot,
+                "username": conn.username,
+                "pos_x": conn.pos_x,
+                "pos_y": conn.pos_y,
+                "pos_z": conn.pos_z,
+                "yaw": conn.yaw,
+                "pitch": conn.pitch,
+                "appearance": conn.appearance
+            }
+            for conn in self._members(room_key)
+            if conn.user_id != exclude_user
+        ]
 
     async def notify_reward_spawn(
         self,
@@ -312,6 +1121,26 @@ class ConnectionManager:
             }
         )
 
+    async def notify_reward_expired(
+        self,
+        maze_id: int,
+        room_x: int,
+        room_y: int,
+        reward_type: str
+    ):
+        """Notify players in the room that its reward expired"""
+        room_key = self._room_key(maze_id, room_x, room_y)
+
+        await self.broadcast_to_room(
+            room_key,
+            {
+                "type": "reward_expired",
+                "room_x": room_x,
+                "room_y": room_y,
+                "reward_type": reward_type
+            }
+        )
+
     async def notify_reward_claimed(
         self,
         maze_id: int,
@@ -339,100 +1168,197 @@ class ConnectionManager:
 # Global connection manager
 manager = ConnectionManager()
 
+# Client message types handled by handle_message (anything else is counted as "unknown")
+MESSAGE_TYPES = ("position_update", "room_change", "chat", "ping", "pong")
 
-async def websocket_endpoint(
-    websocket: WebSocket,
-    token: str,
-    db: AsyncSession
-):
-    """Main WebSocket endpoint handler"""
-    # Authenticate
-    auth_service = AuthService(db)
-    payload = auth_service.decode_token(token)
 
-    if not payload:
-        await websocket.close(code=4001, reason="Invalid token")
-        return
+# position_update fields and their defaults
+POSE_FIELDS = (("pos_x", 0.0), ("pos_y", 1.6), ("pos_z", 0.0), ("yaw", 0.0), ("pitch", 0.0))
 
-    user_id = int(payload.get("sub"))
-    user = await auth_service.get_user_by_id(user_id)
 
-    if not user:
-        await websocket.close(code=4001, reason="User not found")
-        return
+def _pose_fields(data: dict) -> Optional[Tuple[float, float, float, float, float]]:
+    """A client pose as five finite floats; None if any field is not a number (json accepts NaN)"""
+    pose = []
+    for name, default in POSE_FIELDS:
+        value = data.get(name, default)
+        if isinstance(value, bool):
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        if not math.isfinite(value):
+            return None
+        pose.append(value)
+    return tuple(pose)
 
-    # Get active session
-    result = await db.execute(
-        select(GameSession)
-        .where(and_(GameSession.user_id == user_id, GameSession.is_active == True))
-        .order_by(GameSession.started_at.desc())
-        .limit(1)
-    )
-    session = result.scalar_one_or_none()
 
-    if not session:
-        await websocket.close(code=4002, reason="No active game session")
-        return
+async def handle_message(websocket: WebSocket, msg_type: str, data: dict):
+    """Dispatch a single client message"""
+    if msg_type == "position_update":
+        pose = _pose_fields(data)
+        if pose is None:
+            metrics.inc("ws.pose.rejected")
+            return
+        await manager.update_position(websocket, *pose)
 
-    # Get character
-    result = await db.execute(
-        select(Character).where(Character.user_id == user_id)
-    )
-    character = result.scalar_one_or_none()
-    character_data = None
-    if character:
-        character_data = {
-            "gender": character.gender,
-            "skin_color": character.skin_color,
-            "hair_style": character.hair_style,
-            "hair_color": character.hair_color,
-            "shirt_style": character.shirt_style,
-            "shirt_color": character.shirt_color,
-            "pants_style": character.pants_style,
-            "pants_color": character.pants_color
-        }
+    elif msg_type == "room_change":
+        await manager.request_room_change(
+            websocket,
+            data.get("room_x"),
+            data.get("room_y")
+        )
+
+    elif msg_type == "chat":
+        message = data.get("message", "").strip()
+        if message and len(message) <= 500:
+            await manager.send_chat(websocket, message)
+
+    elif msg_type == "ping":
+        manager.send(websocket, {"type": "pong"})
+
+    elif msg_type == "pong":
+        pass  # answer to a heartbeat ping; receiving it already counts as activity
+
+
+class HandshakeRejected(Exception):
+    """The connection is closed with this WebSocket close code and reason"""
+
+    def __init__(self, code: int, reason: str):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+def _character_payload(character: Optional[Character]) -> Optional[dict]:
+    """The appearance fields other clients render, built once per character change"""
+    if character is None:
+        return None
+    return {
+        "gender": character.gender,
+        "skin_color": character.skin_color,
+        "hair_style": character.hair_style,
+        "hair_color": character.hair_color,
+        "shirt_style": character.shirt_style,
+        "shirt_color": character.shirt_color,
+        "pants_style": character.pants_style,
+        "pants_color": character.pants_color
+    }
+
+
+async def resolve_handshake(token: str) -> Tuple[Principal, ActiveSession, Optional[dict]]:
+    """Who is connecting, their session and appearance - from handshake_cache, opening the DB only on a miss"""
+    principal = handshake_cache.get_principal(token)
+    payload = None
+    if principal is None:
+        payload = AuthService.decode_token(token)
+        if not payload or not payload.get("sub"):
+            raise HandshakeRejected(4001, "Invalid token")
+        user_id = int(payload["sub"])
+    else:
+        user_id = principal.user_id
+
+    session = handshake_cache.get_session(user_id)
+    character_data = handshake_cache.get_character(user_id)
+    if (
+        principal is not None and session is not None and character_data is not MISSING
+        and door_grids.get(session.maze_id) is not None
+    ):
+        metrics.inc("ws.handshake.cached")
+        return principal, session, character_data
+
+    metrics.inc("ws.handshake.loaded")
+    generation = handshake_cache.generation
+    async with async_session() as db:
+        if principal is None:
+            user = await AuthService(db).get_user_by_id(user_id)
+            if not user:
+                raise HandshakeRejected(4001, "User not found")
+            principal = handshake_cache.put_principal(token, user.id, user.username, payload.get("exp"))
+
+        if session is None:
+            # Latest active session
+            result = await db.execute(
+                select(GameSession.id, GameSession.maze_id, GameSession.current_room_x, GameSession.current_room_y)
+                .where(and_(GameSession.user_id == user_id, GameSession.is_active == True))
+                .order_by(GameSession.started_at.desc())
+                .limit(1)
+            )
+            row = result.first()
+            if row is None:
+                raise HandshakeRejected(4002, "No active game session")
+            session = handshake_cache.put_session(user_id, *row, generation=generation)
+
+        if character_data is MISSING:
+            character = await CharacterService(db).get_character(user_id)
+            character_data = handshake_cache.put_character(user_id, _character_payload(character), generation)
+
+        # Door grid for the area of interest (one query per maze per process)
+        await door_grids.load(db, session.maze_id)
+
+    return principal, session, character_data
+
+
+async def websocket_endpoint(websocket: WebSocket, token: str):
+    """Main WebSocket endpoint handler"""
+    # Authenticate
+    try:
+        principal, session, character_data = await resolve_handshake(token)
+    except HandshakeRejected as e:
+        await websocket.close(code=e.code, reason=e.reason)
+        return
 
     # Connect
     await manager.connect(
         websocket,
-        user.id,
-        user.username,
-        session.id,
+        principal.user_id,
+        principal.username,
+        session.session_id,
         session.maze_id,
-        session.current_room_x,
-        session.current_room_y,
-        character_data
+        session.room_x,
+        session.room_y,
+        character_data,
+        binary_poses=pose_codec.SUBPROTOCOL in websocket.scope.get("subprotocols", ())
     )
 
+    # Effects still running from before a reconnect
+    from effects import effect_engine
+    for effect in effect_engine.get_effects(session.session_id):
+        manager.send(websocket, {"type": "effect_started", **effect.to_dict()})
+
     try:
         while True:
-            data = await websocket.receive_json()
-            msg_type = data.get("type")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            manager.touch(websocket)
+
+            if message.get("bytes") is not None:
+                # Binary frames carry poses only (maze-pose-v1)
+                pose = pose_codec.decode_pose_update(message["bytes"])
+                if pose is None:
+                    metrics.inc("ws.messages:unknown")
+                    continue
+                await manager.update_position(websocket, *pose)
+                metrics.inc("ws.messages:position_update")
+                continue
 
+            data = json.loads(message["text"])
+            msg_type = data.get("type")
             if msg_type == "position_update":
-                await manager.update_position(
-                    websocket,
-                    data.get("pos_x", 0),
-                    data.get("pos_y", 1.6),
-                    data.get("pos_z", 0),
-                    data.get("yaw", 0),
-                    data.get("pitch", 0)
-                )
-
-            elif msg_type == "room_change":
-                await manager.change_room(
-                    websocket,
-                    data.get("room_x"),
-                    data.get("room_y")
-                )
-
-            elif msg_type == "chat":
-                message = data.get("message", "").strip()
-                if message and len(message) <= 500:
-                    await manager.send_chat(websocket, message)
-
-            elif msg_type == "ping":
-                await websocket.send_json({"type": "pong"})
+                # Hot path: no DB, so skip the per-message query tracking
+                await handle_message(websocket, msg_type, data)
+                metrics.inc("ws.messages:position_update")
+                continue
+
+            with db_stats.track() as stats:
+                await handle_message(websocket, msg_type, data)
+
+            metric_type = msg_type if msg_type in MESSAGE_TYPES else "unknown"
+            metrics.inc(f"ws.messages:{metric_type}")
+            if stats.count:
+                metrics.observe(f"ws.db_queries:{metric_type}", stats.count)
+                metrics.observe(f"ws.db_time_ms:{metric_type}", stats.duration_ms)
 
     except WebSocketDisconnect:
         await manager.disconnect(websocket)
@@ -181,6 +181,11 @@ class ApiClient {
         });
     }
 
+    async getAppearance(hash) {
+        // Content-addressed and served with a long Cache-Control, so the browser caches it
+        return this.request(`/api/character/appearance/${hash}`);
+    }
+
     async getCharacterOptions() {
         return this.request('/api/character/options');
     }
@@ -8,6 +8,8 @@ class Game {
         if (window.useServerProvider && api.token) {
             console.log('Using ServerRoomProvider');
             this.roomProvider = new ServerRoomProvider();
+            // Poses over the binary maze-pose-v1 sub-protocol (set before the provider connects)
+            gameWS.binaryPoses = true;
         } else {
             console.log('Using LocalRoomProvider (fallback)');
             this.roomProvider = new LocalRoomProvider(10, 10);
@@ -35,6 +37,7 @@ class Game {
 
         // Multiplayer
         this.otherPlayers = new Map();
+        this.neighbourPlayers = new Map();  // userId -> player in a door-connected room (roomX, roomY)
         this.positionUpdateInterval = null;
 
         // Footstep sound timing
@@ -174,21 +177,97 @@ class Game {
 
         gameWS.onRoomPlayers = (players) => {
             // Clear and re-add all players
-            this.otherPlayers.clear();
+            this.otherPlayers.forEach((_, userId) => this.removeOtherPlayer(userId));
             players.forEach(p => this.addOtherPlayer(p));
         };
 
+        // Players in door-connected neighbour rooms (seen through open doors)
+        gameWS.onNeighbourPlayers = (players) => {
+            const visible = new Set(players.map(p => p.userId));
+            this.neighbourPlayers.forEach((_, userId) => {
+                if (!visible.has(userId)) this.removeNeighbourPlayer(userId);
+            });
+            players.forEach(p => this.addNeighbourPlayer(p));
+        };
+
+        gameWS.onNeighbourJoined = (data) => {
+            this.addNeighbourPlayer({
+                userId: data.user_id,
+                username: data.username,
+                character: data.character,
+                roomX: data.room_x,
+                roomY: data.room_y,
+                posX: 0,
+                posY: 1.6,
+                posZ: 0,
+                yaw: 0,
+                pitch: 0
+            });
+        };
+
+        gameWS.onNeighbourLeft = (data) => {
+            this.removeNeighbourPlayer(data.user_id);
+        };
+
+        gameWS.onNeighbourMoved = (data) => {
+            const player = this.neighbourPlayers.get(data.user_id);
+            if (!player) return;
+            player.posX = data.pos_x;
+            player.posY = data.pos_y;
+            player.posZ = data.pos_z;
+            player.yaw = data.yaw;
+            player.pitch = data.pitch;
+        };
+
+        gameWS.onAppearanceLoaded = (userId, character) => {
+            // Appearance arrived over HTTP after the player was added - rebuild the avatar
+            const neighbour = this.neighbourPlayers.get(userId);
+            if (neighbour) {
+                this.addNeighbourPlayer({ ...neighbour, character });
+                return;
+            }
+            const player = this.otherPlayers.get(userId);
+            if (!player) return;
+            this.removeOtherPlayer(userId);
+            this.addOtherPlayer({
+                user_id: userId,
+                username: player.username,
+                character,
+                pos_x: player.posX,
+                pos_y: player.posY,
+                pos_z: player.posZ,
+                yaw: player.yaw,
+                pitch: player.pitch
+            });
+        };
+
         gameWS.onRewardSpawned = (data) => {
             console.log('Ödül spawn oldu:', data);
             // Only show notification, actual reward is in room
+            if (this.currentRoom) {
+                this.currentRoom.reward = { type: data.reward_type, amount: data.amount, expires_at: data.expires_at };
+            }
             if (uiManager) {
-                uiManager.showNotification(
+                this.rewardNotification = uiManager.showNotification(
                     `Bu odada $${data.amount.toFixed(2)} ödül var!`,
                     'reward'
                 );
             }
         };
 
+        gameWS.onRewardExpired = (data) => {
+            // Only sent to the reward's room; ignore it if we already left
+            if (!this.currentRoom || data.room_x !== this.currentRoom.x || data.room_y !== this.currentRoom.y) return;
+            delete this.currentRoom.reward;
+            if (this.rewardNotification) {
+                this.rewardNotification.remove();
+                this.rewardNotification = null;
+            }
+            if (uiManager) {
+                uiManager.showNotification('Bu odadaki ödülün süresi doldu', 'info');
+            }
+        };
+
         gameWS.onRewardClaimed = (data) => {
             if (uiManager) {
                 if (data.is_big_reward) {
@@ -205,18 +284,51 @@ class Game {
             }
         };
 
+        // Server is authoritative for timed trap effects (re-sent after a reconnect)
+        gameWS.onEffectStarted = (data) => {
+            if (this.roomProvider.applyTrapEffect) {
+                this.roomProvider.applyTrapEffect({
+                    trap_type: data.effect,
+                    duration: data.remaining,
+                    speed_multiplier: data.speed_multiplier
+                });
+            }
+        };
+
+        gameWS.onEffectEnded = (data) => {
+            if (this.roomProvider.endTrapEffect) {
+                this.roomProvider.endTrapEffect(data.effect);
+            }
+            if (uiManager) {
+                uiManager.hideTrapEffect();
+            }
+        };
+
         gameWS.onGameEnded = (data) => {
             // Big reward claimed - game over
             alert(`Oyun bitti! ${data.winner} büyük ödülü kazandı: $${data.amount}!`);
             location.reload();
         };
 
+        gameWS.onRoomChangeRejected = () => {
+            // The server keeps us in the session room - reload it from there
+            this.resyncRoom();
+        };
+
+        gameWS.onRateHint = (intervalMs) => {
+            // Server-recommended send interval
+            this.startPositionBroadcast(intervalMs);
+        };
+
         // Start position broadcasting
         this.startPositionBroadcast();
     }
 
-    startPositionBroadcast() {
-        // Send position updates every 100ms
+    startPositionBroadcast(intervalMs = 100) {
+        // Send position updates every intervalMs (100ms unless the server sends a rate_hint)
+        if (this.positionUpdateInterval) {
+            clearInterval(this.positionUpdateInterval);
+        }
         this.positionUpdateInterval = setInterval(() => {
             if (this.roomProvider.update3DPosition) {
                 this.roomProvider.update3DPosition(
@@ -227,10 +339,13 @@ class Game {
                     this.player.rotationX
                 );
             }
-        }, 100);
+        }, intervalMs);
     }
 
     addOtherPlayer(data) {
+        // Walked in from a neighbour room
+        this.neighbourPlayers.delete(data.user_id);
+
         const playerData = {
             userId: data.user_id,
             username: data.username,
@@ -256,6 +371,27 @@ class Game {
         }
     }
 
+    addNeighbourPlayer(player) {
+        if (this.otherPlayers.has(player.userId)) return;  // already in our room
+        this.neighbourPlayers.set(player.userId, { ...player });
+        if (this.renderer) {
+            this.renderer.addOtherPlayer(this.withRoomOffset(player));
+        }
+    }
+
+    removeNeighbourPlayer(userId) {
+        if (!this.neighbourPlayers.delete(userId)) return;
+        if (this.renderer && !this.otherPlayers.has(userId)) {
+            this.renderer.removeOtherPlayer(userId);
+        }
+    }
+
+    // Neighbour rooms are drawn one room size away, through the door
+    withRoomOffset(player) {
+        const room = this.currentRoom || { x: player.roomX, y: player.roomY };
+        return { ...player, roomDX: player.roomX - room.x, roomDY: player.roomY - room.y };
+    }
+
     updateOtherPlayer(data) {
         const player = this.otherPlayers.get(data.user_id);
         if (player) {
@@ -358,14 +494,37 @@ class Game {
         // Update ambient sound for new room
         this.startRoomAmbient();
 
-        // Clear other players (they're in different room now)
-        this.otherPlayers.clear();
-        // Note: renderer doesn't have clearOtherPlayers method
+        // Other players are replaced by the server's room_players for the new room
+        // (it may already have arrived during the move request)
 
         this.updateDebugInfo();
         this.updatePortalIndicator();
     }
 
+    async resyncRoom() {
+        if (!(this.roomProvider instanceof ServerRoomProvider) || this.resyncingRoom) return;
+        this.resyncingRoom = true;
+        try {
+            const room = await this.roomProvider.syncCurrentRoom();
+            if (room.x === this.player.roomX && room.y === this.player.roomY) return;
+            console.warn('Room re-synced to server room:', room.x, room.y);
+
+            this.currentRoom = room;
+            this.player.roomX = room.x;
+            this.player.roomY = room.y;
+            this.lastRoomX = room.x;
+            this.lastRoomY = room.y;
+            this.renderer.updateRoom(this.currentRoom);
+            this.startRoomAmbient();
+            this.updateDebugInfo();
+            this.updatePortalIndicator();
+        } catch (error) {
+            console.error('Room re-sync failed:', error);
+        } finally {
+            this.resyncingRoom = false;
+        }
+    }
+
     handleReward(reward) {
         if (uiManager) {
             uiManager.showRewardPopup(reward.amount, reward.isBigReward);
@@ -573,6 +732,11 @@ class Game {
                 this.renderer.updateOtherPlayer(userId, player);
             }
         });
+        this.neighbourPlayers.forEach((player, userId) => {
+            if (this.renderer) {
+                this.renderer.updateOtherPlayer(userId, this.withRoomOffset(player));
+            }
+        });
 
         // Minimap güncelle
         this.minimap.draw();
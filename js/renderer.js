@@ -15,6 +15,7 @@ class Renderer {
         this.doorLabels = [];
         this.videoElements = []; // Video elementlerini sakla (ses kontrolü için)
         this.audioEnabled = false; // Ses başlangıçta kapalı
+        this.otherPlayerMeshes = new Map(); // userId -> avatar (oda değişiminde silinmez)
 
         this.init();
     }
@@ -1004,6 +1005,66 @@ class Renderer {
         this.render();
     }
 
+    // === OTHER PLAYERS ===
+
+    // Basit avatar: karakter renkleriyle bacak, gövde ve kafa
+    addOtherPlayer(playerData) {
+        this.removeOtherPlayer(playerData.userId);
+
+        const character = playerData.character || {};
+        const avatar = new THREE.Group();
+
+        const legs = new THREE.Mesh(
+            new THREE.CylinderGeometry(0.18, 0.15, 0.8, 12),
+            new THREE.MeshStandardMaterial({ color: character.pants_color || '#2C3E50' })
+        );
+        legs.position.y = 0.4;
+        avatar.add(legs);
+
+        const body = new THREE.Mesh(
+            new THREE.CylinderGeometry(0.25, 0.2, 0.65, 12),
+            new THREE.MeshStandardMaterial({ color: character.shirt_color || '#3498DB' })
+        );
+        body.position.y = 1.1;
+        avatar.add(body);
+
+        const head = new THREE.Mesh(
+            new THREE.SphereGeometry(0.17, 16, 16),
+            new THREE.MeshStandardMaterial({ color: character.skin_color || '#F5DEB3' })
+        );
+        head.position.y = 1.6;
+        avatar.add(head);
+
+        this.scene.add(avatar);
+        this.otherPlayerMeshes.set(playerData.userId, avatar);
+        this.updateOtherPlayer(playerData.userId, playerData);
+    }
+
+    // roomDX/roomDY: oyuncunun odası bizim odamıza göre kaç oda ötede (komşu odalar).
+    // Sunucu koordinatları: doğu +x, kuzey +y. Sahnede doğu +x, kuzey duvarı -z'de,
+    // yani roomDX -> +x, roomDY -> -z.
+    updateOtherPlayer(userId, playerData) {
+        const avatar = this.otherPlayerMeshes.get(userId);
+        if (!avatar) return;
+        avatar.position.set(
+            playerData.posX + (playerData.roomDX || 0) * this.roomSize,
+            playerData.posY - 1.6,  // posY göz hizası
+            playerData.posZ - (playerData.roomDY || 0) * this.roomSize
+        );
+        avatar.rotation.y = playerData.yaw;
+    }
+
+    removeOtherPlayer(userId) {
+        const avatar = this.otherPlayerMeshes.get(userId);
+        if (!avatar) return;
+        this.scene.remove(avatar);
+        avatar.children.forEach(mesh => {
+            mesh.geometry.dispose();
+            mesh.material.dispose();
+        });
+        this.otherPlayerMeshes.delete(userId);
+    }
+
     // === DECORATION CREATION METHODS ===
 
     // === CHRISTMAS DECORATIONS ===
@@ -340,6 +340,13 @@ class ServerRoomProvider extends RoomProvider {
         return this.currentRoom;
     }
 
+    // Sunucudaki oturum odasını yeniden yükle (WebSocket oda değişikliği reddedildiğinde)
+    async syncCurrentRoom() {
+        const data = await api.getCurrentRoom(this.sessionToken);
+        this.currentRoom = enrichRoomWithDecorations(data);
+        return this.currentRoom;
+    }
+
     async moveToRoom(direction) {
         // Freeze kontrolü
         if (this.trapEffects.frozen) {
@@ -458,6 +465,32 @@ class ServerRoomProvider extends RoomProvider {
         };
     }
 
+    // Sunucu bir efektin bittiğini bildirdi
+    endTrapEffect(effectType) {
+        switch (effectType) {
+            case 'freeze':
+                this.trapEffects.frozen = false;
+                this.trapEffects.frozenUntil = null;
+                break;
+
+            case 'blind':
+                this.trapEffects.blind = false;
+                this.trapEffects.blindUntil = null;
+                break;
+
+            case 'slow':
+                this.trapEffects.slow = false;
+                this.trapEffects.slowUntil = null;
+                this.trapEffects.speedMultiplier = 1.0;
+                break;
+
+            case 'reverse_controls':
+                this.trapEffects.reverseControls = false;
+                this.trapEffects.reverseUntil = null;
+                break;
+        }
+    }
+
     // Tuzak efektlerini kontrol et ve güncelle
     updateTrapEffects() {
         const now = new Date();
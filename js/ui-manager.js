@@ -327,6 +327,13 @@ class UIManager {
         gameWS.onChatMessage = (data) => {
             this.addChatMessage(data.username, data.message, data.timestamp);
         };
+
+        // Chat is per room: entering a room shows its recent history instead
+        gameWS.onChatHistory = (messages) => {
+            const messagesContainer = document.getElementById('chat-messages');
+            if (messagesContainer) messagesContainer.innerHTML = '';
+            messages.forEach(m => this.addChatMessage(m.username, m.message, m.timestamp, true));
+        };
     }
 
     sendChatMessage() {
@@ -342,7 +349,7 @@ class UIManager {
         }
     }
 
-    addChatMessage(username, message, timestamp) {
+    addChatMessage(username, message, timestamp, silent = false) {
         const messagesContainer = document.getElementById('chat-messages');
         if (!messagesContainer) return;
 
@@ -361,7 +368,7 @@ class UIManager {
         messagesContainer.appendChild(messageEl);
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
 
-        if (soundManager) soundManager.playChatMessage();
+        if (soundManager && !silent) soundManager.playChatMessage();
     }
 
     // ==================== MENU UI ====================
@@ -646,6 +653,7 @@ class UIManager {
         setTimeout(() => {
             notification.remove();
         }, 3000);
+        return notification;
     }
 
     showRewardPopup(amount, isBigReward = false) {
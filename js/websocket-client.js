@@ -1,5 +1,23 @@
 // WebSocket Client for Multiplayer
 
+// Binary pose sub-protocol (see backend/pose_codec.py): poses are sent as
+// 16-bit quantized values, other messages stay JSON
+const POSE_SUBPROTOCOL = 'maze-pose-v1';
+const POSE_UPDATE = 0x01;
+const POSE_SNAPSHOT = 0x02;
+const POSE_RANGE = 8.0;
+const POSE_SCALE = 65535 / (2 * POSE_RANGE);
+const ANGLE_SCALE = 32768 / Math.PI;
+
+function quantizePosition(value) {
+    return Math.min(65535, Math.max(0, Math.round((value + POSE_RANGE) * POSE_SCALE)));
+}
+
+function quantizeAngle(value) {
+    const wrapped = ((value + Math.PI) % (2 * Math.PI) + 2 * Math.PI) % (2 * Math.PI) - Math.PI;
+    return Math.min(32767, Math.max(-32768, Math.round(wrapped * ANGLE_SCALE)));
+}
+
 class GameWebSocket {
     constructor(serverUrl = 'ws://localhost:7100/ws') {
         this.serverUrl = serverUrl;
@@ -15,14 +33,39 @@ class GameWebSocket {
         this.onPlayerMoved = null;
         this.onRoomPlayers = null;
         this.onChatMessage = null;
+        this.onChatHistory = null;
         this.onRewardSpawned = null;
+        this.onRewardExpired = null;
         this.onRewardClaimed = null;
+        this.onEffectStarted = null;
+        this.onEffectEnded = null;
+        this.onNeighbourJoined = null;
+        this.onNeighbourLeft = null;
+        this.onNeighbourMoved = null;
+        this.onNeighbourPlayers = null;
+        this.onRoomChangeRejected = null;
+        this.onRateHint = null;
+        this.onAppearanceLoaded = null;
         this.onGameEnded = null;
         this.onConnect = null;
         this.onDisconnect = null;
 
         // Players in current room
         this.playersInRoom = new Map();
+        // Players in door-connected rooms (area of interest), with their roomX / roomY
+        this.nearbyPlayers = new Map();
+        this.roomX = null;
+        this.roomY = null;
+        // Opt in (before connect()) to binary pose frames; they name players by slot instead of user id
+        this.binaryPoses = false;
+        this.slots = new Map();  // slot -> user_id
+        // Messages name characters by content hash; the server sends each one to us only once
+        this.appearances = new Map();  // hash -> character
+        this.appearanceRequests = new Set();  // hashes being fetched over HTTP
+    }
+
+    get usingBinaryPoses() {
+        return this.ws !== null && this.ws.protocol === POSE_SUBPROTOCOL;
     }
 
     connect(token) {
@@ -32,7 +75,8 @@ class GameWebSocket {
         }
 
         const url = `${this.serverUrl}?token=${token}`;
-        this.ws = new WebSocket(url);
+        this.ws = this.binaryPoses ? new WebSocket(url, [POSE_SUBPROTOCOL]) : new WebSocket(url);
+        this.ws.binaryType = 'arraybuffer';
 
         this.ws.onopen = () => {
             console.log('WebSocket connected');
@@ -45,6 +89,8 @@ class GameWebSocket {
             console.log('WebSocket disconnected', event.code, event.reason);
             this.connected = false;
             this.playersInRoom.clear();
+            this.nearbyPlayers.clear();
+            this.slots.clear();
             if (this.onDisconnect) this.onDisconnect(event);
 
             // Auto-reconnect
@@ -60,7 +106,11 @@ class GameWebSocket {
         };
 
         this.ws.onmessage = (event) => {
-            this.handleMessage(JSON.parse(event.data));
+            if (typeof event.data === 'string') {
+                this.handleMessage(JSON.parse(event.data));
+            } else {
+                this.handlePoseFrame(event.data);
+            }
         };
     }
 
@@ -71,28 +121,140 @@ class GameWebSocket {
         }
         this.connected = false;
         this.playersInRoom.clear();
+        this.nearbyPlayers.clear();
+        this.slots.clear();
+    }
+
+    // Character for an appearance hash; unknown ones are fetched (cacheable) and reported via onAppearanceLoaded
+    characterFor(hash) {
+        if (!hash) return null;
+        const character = this.appearances.get(hash);
+        if (character) return character;
+
+        if (!this.appearanceRequests.has(hash)) {
+            this.appearanceRequests.add(hash);
+            api.getAppearance(hash)
+                .then(loaded => {
+                    this.appearances.set(hash, loaded);
+                    [this.playersInRoom, this.nearbyPlayers].forEach(players => players.forEach(p => {
+                        if (p.appearance !== hash) return;
+                        p.character = loaded;
+                        if (this.onAppearanceLoaded) this.onAppearanceLoaded(p.userId, loaded);
+                    }));
+                })
+                .catch(error => console.warn('Appearance fetch failed:', hash, error))
+                .finally(() => this.appearanceRequests.delete(hash));
+        }
+        return null;
+    }
+
+    isOwnRoom(data) {
+        return data.room_x === undefined || (data.room_x === this.roomX && data.room_y === this.roomY);
+    }
+
+    // Pose update for a player in our room or a neighbouring one
+    applyPose(userId, pose) {
+        const player = this.playersInRoom.get(userId) || this.nearbyPlayers.get(userId);
+        if (!player) return;  // ourselves, or not in our area of interest
+        player.posX = pose.pos_x;
+        player.posY = pose.pos_y;
+        player.posZ = pose.pos_z;
+        player.yaw = pose.yaw;
+        player.pitch = pose.pitch;
+
+        if (this.playersInRoom.has(userId)) {
+            if (this.onPlayerMoved) this.onPlayerMoved(pose);
+        } else if (this.onNeighbourMoved) {
+            this.onNeighbourMoved({ ...pose, room_x: player.roomX, room_y: player.roomY });
+        }
+    }
+
+    // Binary room snapshot: per player a slot, a field mask and only the
+    // fields that changed since the previous snapshot
+    handlePoseFrame(buffer) {
+        const view = new DataView(buffer);
+        if (view.getUint8(0) !== POSE_SNAPSHOT) return;
+
+        const count = view.getUint16(1, true);
+        let offset = 3;
+        for (let i = 0; i < count; i++) {
+            const slot = view.getUint16(offset, true);
+            const mask = view.getUint8(offset + 2);
+            offset += 3;
+
+            const pose = [0, 0, 0, 0, 0];
+            for (let field = 0; field < 5; field++) {
+                if (mask & (1 << field)) {
+                    pose[field] = field < 3 ? view.getUint16(offset, true) : view.getInt16(offset, true);
+                    offset += 2;
+                }
+            }
+
+            const userId = this.slots.get(slot);
+            const player = this.playersInRoom.get(userId) || this.nearbyPlayers.get(userId);
+            if (!player) continue;  // ourselves, or not in our area of interest
+            this.applyPose(userId, {
+                user_id: userId,
+                pos_x: mask & 1 ? pose[0] / POSE_SCALE - POSE_RANGE : player.posX,
+                pos_y: mask & 2 ? pose[1] / POSE_SCALE - POSE_RANGE : player.posY,
+                pos_z: mask & 4 ? pose[2] / POSE_SCALE - POSE_RANGE : player.posZ,
+                yaw: mask & 8 ? pose[3] / ANGLE_SCALE : player.yaw,
+                pitch: mask & 16 ? pose[4] / ANGLE_SCALE : player.pitch
+            });
+        }
     }
 
     handleMessage(data) {
+        if (data.appearances) {
+            Object.entries(data.appearances).forEach(([hash, character]) => this.appearances.set(hash, character));
+        }
+
         switch (data.type) {
-            case 'player_joined':
-                this.playersInRoom.set(data.user_id, {
+            case 'appearances':
+                // Stored above, ahead of the player_joined that uses them
+                break;
+
+            case 'player_joined': {
+                this.slots.set(data.slot, data.user_id);
+                data.character = this.characterFor(data.appearance);
+                const joined = {
                     userId: data.user_id,
+                    slot: data.slot,
                     username: data.username,
+                    appearance: data.appearance,
                     character: data.character,
                     posX: 0,
                     posY: 1.6,
                     posZ: 0,
                     yaw: 0,
                     pitch: 0
-                });
-                if (this.onPlayerJoined) this.onPlayerJoined(data);
+                };
+                if (this.isOwnRoom(data)) {
+                    this.playersInRoom.set(data.user_id, joined);
+                    if (this.onPlayerJoined) this.onPlayerJoined(data);
+                } else {
+                    // Walked into a room we can see through a door
+                    this.nearbyPlayers.set(data.user_id, { ...joined, roomX: data.room_x, roomY: data.room_y });
+                    if (this.onNeighbourJoined) this.onNeighbourJoined(data);
+                }
                 break;
+            }
 
-            case 'player_left':
-                this.playersInRoom.delete(data.user_id);
-                if (this.onPlayerLeft) this.onPlayerLeft(data);
+            case 'player_left': {
+                const own = this.isOwnRoom(data);
+                const players = own ? this.playersInRoom : this.nearbyPlayers;
+                const left = players.get(data.user_id);
+                if (left) {
+                    this.slots.delete(left.slot);
+                    players.delete(data.user_id);
+                }
+                if (own) {
+                    if (this.onPlayerLeft) this.onPlayerLeft(data);
+                } else if (this.onNeighbourLeft) {
+                    this.onNeighbourLeft(data);
+                }
                 break;
+            }
 
             case 'player_moved':
                 if (this.playersInRoom.has(data.user_id)) {
@@ -106,12 +268,25 @@ class GameWebSocket {
                 if (this.onPlayerMoved) this.onPlayerMoved(data);
                 break;
 
+            case 'room_snapshot':
+                // Latest poses of every player that moved since the last server tick
+                data.players.forEach(p => this.applyPose(p.user_id, p));
+                break;
+
             case 'room_players':
+                this.roomX = data.room_x;
+                this.roomY = data.room_y;
+                this.playersInRoom.forEach(p => this.slots.delete(p.slot));
                 this.playersInRoom.clear();
                 data.players.forEach(p => {
+                    this.nearbyPlayers.delete(p.user_id);
+                    this.slots.set(p.slot, p.user_id);
+                    p.character = this.characterFor(p.appearance);
                     this.playersInRoom.set(p.user_id, {
                         userId: p.user_id,
+                        slot: p.slot,
                         username: p.username,
+                        appearance: p.appearance,
                         character: p.character,
                         posX: p.pos_x,
                         posY: p.pos_y,
@@ -121,6 +296,40 @@ class GameWebSocket {
                     });
                 });
                 if (this.onRoomPlayers) this.onRoomPlayers(data.players);
+                // Recent chat of the room we just entered (oldest first)
+                if (this.onChatHistory) this.onChatHistory(data.chat || []);
+                break;
+
+            case 'neighbour_players':
+                // Rooms that came into / went out of view through a door
+                data.dropped.forEach(([roomX, roomY]) => {
+                    this.nearbyPlayers.forEach((p, userId) => {
+                        if (p.roomX !== roomX || p.roomY !== roomY) return;
+                        this.nearbyPlayers.delete(userId);
+                        if (!this.playersInRoom.has(userId)) this.slots.delete(p.slot);
+                    });
+                });
+                data.rooms.forEach(room => {
+                    room.players.forEach(p => {
+                        this.slots.set(p.slot, p.user_id);
+                        p.character = this.characterFor(p.appearance);
+                        this.nearbyPlayers.set(p.user_id, {
+                            userId: p.user_id,
+                            slot: p.slot,
+                            username: p.username,
+                            appearance: p.appearance,
+                            character: p.character,
+                            roomX: room.room_x,
+                            roomY: room.room_y,
+                            posX: p.pos_x,
+                            posY: p.pos_y,
+                            posZ: p.pos_z,
+                            yaw: p.yaw,
+                            pitch: p.pitch
+                        });
+                    });
+                });
+                if (this.onNeighbourPlayers) this.onNeighbourPlayers(this.getNearbyPlayers());
                 break;
 
             case 'chat_message':
@@ -131,6 +340,10 @@ class GameWebSocket {
                 if (this.onRewardSpawned) this.onRewardSpawned(data);
                 break;
 
+            case 'reward_expired':
+                if (this.onRewardExpired) this.onRewardExpired(data);
+                break;
+
             case 'reward_claimed':
                 if (this.onRewardClaimed) this.onRewardClaimed(data);
                 if (data.is_big_reward && data.game_ended) {
@@ -138,6 +351,30 @@ class GameWebSocket {
                 }
                 break;
 
+            case 'effect_started':
+                if (this.onEffectStarted) this.onEffectStarted(data);
+                break;
+
+            case 'effect_ended':
+                if (this.onEffectEnded) this.onEffectEnded(data);
+                break;
+
+            case 'room_change_rejected':
+                // Not reachable from our room on the server; it keeps us in (room_x, room_y)
+                console.warn('Room change rejected, server room:', data.room_x, data.room_y);
+                if (this.onRoomChangeRejected) this.onRoomChangeRejected(data);
+                break;
+
+            case 'rate_hint':
+                // Server asks for fewer position updates (crowded room or busy server)
+                if (this.onRateHint) this.onRateHint(data.interval_ms);
+                break;
+
+            case 'ping':
+                // Server heartbeat - silent clients get disconnected
+                this.send({ type: 'pong' });
+                break;
+
             case 'pong':
                 // Heartbeat response
                 break;
@@ -155,6 +392,19 @@ class GameWebSocket {
 
     // Send position update
     updatePosition(posX, posY, posZ, yaw, pitch) {
+        if (this.usingBinaryPoses) {
+            if (this.ws.readyState !== WebSocket.OPEN) return;
+            const view = new DataView(new ArrayBuffer(11));
+            view.setUint8(0, POSE_UPDATE);
+            view.setUint16(1, quantizePosition(posX), true);
+            view.setUint16(3, quantizePosition(posY), true);
+            view.setUint16(5, quantizePosition(posZ), true);
+            view.setInt16(7, quantizeAngle(yaw), true);
+            view.setInt16(9, quantizeAngle(pitch), true);
+            this.ws.send(view.buffer);
+            return;
+        }
+
         this.send({
             type: 'position_update',
             pos_x: posX,
@@ -191,6 +441,11 @@ class GameWebSocket {
     getPlayersInRoom() {
         return Array.from(this.playersInRoom.values());
     }
+
+    // Get players in the door-connected rooms around us
+    getNearbyPlayers() {
+        return Array.from(this.nearbyPlayers.values());
+    }
 }
 
 // Global WebSocket client instance